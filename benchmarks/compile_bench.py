@@ -0,0 +1,59 @@
+"""Per-job compile time with and without the precompiled preamble format.
+
+Usage (from the repository root):
+    python -m benchmarks.compile_bench --runs 10
+"""
+import argparse
+import asyncio
+import shutil
+import statistics
+import time
+
+from cvforgebot.latex.compiler import LaTeXCompiler
+from cvforgebot.latex.fixtures import SAMPLE_CV
+
+BENCH_USER_ID = 0
+
+
+def summarize(label: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(
+        f"{label:<16} runs={len(timings)} mean={statistics.mean(timings) * 1000:.1f}ms "
+        f"median={statistics.median(timings) * 1000:.1f}ms p95={p95 * 1000:.1f}ms"
+    )
+
+
+async def time_jobs(compiler: LaTeXCompiler, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await compiler.generate_pdf(dict(SAMPLE_CV), BENCH_USER_ID)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    compiler = LaTeXCompiler()
+    # Measure compilation itself, not cache hits
+    compiler.cache = None
+
+    compiler.use_format = False
+    summarize('no format', await time_jobs(compiler, args.runs))
+
+    compiler.use_format = True
+    start = time.perf_counter()
+    await compiler.warm_up()
+    print(f"format build: {(time.perf_counter() - start) * 1000:.1f}ms")
+    summarize('with format', await time_jobs(compiler, args.runs))
+
+    print(f"passes per job: {dict(compiler.pass_counts)}")
+    shutil.rmtree(f"{compiler.output_dir}/{BENCH_USER_ID}", ignore_errors=True)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
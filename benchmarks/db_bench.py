@@ -0,0 +1,104 @@
+"""Form-answer write throughput of the storage layer.
+
+Simulates USERS users answering every form field concurrently and reports
+writes per second and transactions per resume for the async UPSERT backend
+(write-through and write-behind) and for the old connect-per-call
+SELECT/INSERT/UPDATE pattern.
+
+Usage (from the repository root):
+    python -m benchmarks.db_bench --users 200
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+from cvforgebot.config import FORM_CHECKPOINT_EVERY
+from cvforgebot.storage.db import Database, SETTING_FIELDS
+
+# The answers of the form, in any order
+FIELDS = sorted(Database.VALID_FIELDS - set(SETTING_FIELDS))
+
+
+def legacy_update(db_name: str, user_id: int, field: str, value: str):
+    """The pre-aiosqlite implementation, kept here as the baseline."""
+    with sqlite3.connect(db_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1 FROM user_data WHERE user_id = ?', (user_id,))
+        if not cursor.fetchone():
+            fields = ['user_id'] + FIELDS
+            placeholders = ', '.join('?' * len(fields))
+            cursor.execute(
+                f'INSERT INTO user_data ({", ".join(fields)}) VALUES ({placeholders})',
+                [user_id] + [None] * len(FIELDS)
+            )
+        cursor.execute(f'UPDATE user_data SET {field} = ? WHERE user_id = ?', (value, user_id))
+        conn.commit()
+
+
+async def bench_async(db_name: str, users: int, write_behind: bool):
+    db = Database(db_name)
+
+    async def fill(user_id: int):
+        if write_behind:
+            # As handlers.form.save_answer and load_form_data: a checkpoint every
+            # FORM_CHECKPOINT_EVERY answers, the rest is flushed when the summary is shown
+            answers, pending = {}, 0
+            for field in FIELDS:
+                answers[field] = f"answer for {field}"
+                pending += 1
+                if pending >= FORM_CHECKPOINT_EVERY:
+                    await db.save_user_data(user_id, dict(answers))
+                    pending = 0
+            if pending:
+                await db.save_user_data(user_id, answers)
+            return
+        for field in FIELDS:
+            await db.update_user_data(user_id, field, f"answer for {field}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(fill(user_id) for user_id in range(users)))
+    elapsed = time.perf_counter() - start
+    await db.close()
+    return elapsed, db.transactions / users
+
+
+def bench_legacy(db_name: str, users: int) -> float:
+    start = time.perf_counter()
+    for user_id in range(users):
+        for field in FIELDS:
+            legacy_update(db_name, user_id, field, f"answer for {field}")
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200)
+    args = parser.parse_args()
+    writes = args.users * len(FIELDS)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, write_behind in (('write-through', False), ('write-behind', True)):
+            db_name = os.path.join(tmp, f'{label}.db')
+            elapsed, per_resume = await bench_async(db_name, args.users, write_behind)
+            print(
+                f"{label + ':':<15}{writes} answers in {elapsed:.2f}s "
+                f"({writes / elapsed:.0f} answers/s, {per_resume:.1f} transactions/resume)"
+            )
+
+        legacy_db = os.path.join(tmp, 'legacy.db')
+        # The flat single-table schema the legacy code was written for
+        with sqlite3.connect(legacy_db) as conn:
+            for statement in Database.MIGRATIONS[0]:
+                conn.execute(statement)
+        elapsed = bench_legacy(legacy_db, args.users)
+        print(
+            f"{'legacy:':<15}{writes} answers in {elapsed:.2f}s "
+            f"({writes / elapsed:.0f} answers/s, {len(FIELDS)} transactions/resume)"
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""Microbenchmarks for LaTeX escaping and template rendering.
+
+Compares the old per-call regex escaper with the precompiled translate table
+on long English, Cyrillic and special-character heavy inputs, and times a full
+render with per-field |e escaping against one-shot pre-escaping of the data.
+
+Usage (from the repository root):
+    python -m benchmarks.escape_bench --number 2000
+"""
+import argparse
+import re
+import timeit
+
+from cvforgebot.config import LATEX_MAX_FIELD_CHARS
+from cvforgebot.latex import compiler as compiler_module
+from cvforgebot.latex.compiler import LaTeXCompiler, escape_tex
+from cvforgebot.latex.fixtures import SAMPLE_CV
+
+INPUTS = {
+    'long english': (
+        'Led the migration of 40 services to Kubernetes, reduced infrastructure costs by 35% '
+        'and built CI/CD pipelines used by 12 teams. '
+    ) * 40,
+    'cyrillic': (
+        'Руководил переводом 40 сервисов на Kubernetes, снизил затраты на инфраструктуру на 35% '
+        'и построил CI/CD для 12 команд. '
+    ) * 40,
+    'special heavy': r'C# & C++ {templates} 100% $cost_~^ <tags> \path ' * 60,
+}
+
+
+def legacy_escape_tex(value):
+    """The previous implementation, rebuilding its table and regex on every call."""
+    if not isinstance(value, str):
+        return value
+    tex_chars = {
+        '&': r'\&', '%': r'\%', '$': r'\$', '#': r'\#', '_': r'\_', '{': r'\{', '}': r'\}',
+        '~': r'\textasciitilde{}', '^': r'\^{}', '\\': r'\textbackslash{}',
+        '<': r'\textless{}', '>': r'\textgreater{}',
+    }
+    pattern = '|'.join(re.escape(key) for key in tex_chars.keys())
+    return re.sub(pattern, lambda m: tex_chars[m.group()], value)
+
+
+def long_cv() -> dict:
+    """SAMPLE_CV with fields as long as the input limits allow."""
+    data = dict(SAMPLE_CV)
+    description = INPUTS['long english'][:LATEX_MAX_FIELD_CHARS]
+    data['experience'] = [dict(SAMPLE_CV['experience'][0], description=description)]
+    data['additional_info'] = INPUTS['cyrillic'][:LATEX_MAX_FIELD_CHARS]
+    return data
+
+
+def time_us(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    for label, text in INPUTS.items():
+        assert legacy_escape_tex(text) == escape_tex(text)
+        legacy = time_us(lambda: legacy_escape_tex(text), args.number)
+        current = time_us(lambda: escape_tex(text), args.number)
+        print(f"escape {label:<14} legacy={legacy:8.1f}us translate={current:8.1f}us ({legacy / current:.1f}x)")
+
+    data = long_cv()
+    for preescape in (False, True):
+        compiler_module.LATEX_PREESCAPE = preescape
+        compiler = LaTeXCompiler()
+        template = compiler.templates.get()
+        render = lambda: template.render(compiler._prepare_data(data))
+        render()
+        label = 'pre-escaped' if preescape else 'per-field |e'
+        print(f"render {label:<14} {time_us(render, args.number // 10):8.1f}us")
+
+
+if __name__ == '__main__':
+    main()
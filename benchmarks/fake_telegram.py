@@ -0,0 +1,135 @@
+"""A minimal local stand-in for the Telegram Bot API used by the benchmarks.
+
+Every request to /bot<token>/<method> is answered with a plausible result,
+so aiogram can parse it. Calls are recorded per method and per chat.
+
+Documents sent by file_id are accepted only if the file_id was issued by an
+earlier upload and not revoked with forget_file_ids(), like the real API.
+"""
+import asyncio
+import itertools
+import time
+from collections import Counter, defaultdict
+
+from aiohttp import web
+
+MESSAGE_METHODS = {'sendMessage', 'sendDocument', 'editMessageText'}
+
+
+class FakeTelegramServer:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self.calls = Counter()
+        self.uploaded_bytes = 0
+        self.pending_updates = asyncio.Queue()
+        # chat_id -> list of (monotonic time, method) of bot replies
+        self.replies = defaultdict(list)
+        self._reply_waiters = {}
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        # file_id -> document of uploads, for sends that reference them
+        self.documents = {}
+        self.file_id_sends = 0
+        self._runner = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post('/bot{token}/{method}', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Resolve the port when an ephemeral one was requested
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def wait_for_reply(self, chat_id: int) -> asyncio.Future:
+        """Return a future resolved with the time of the next bot call for this chat."""
+        future = asyncio.get_running_loop().create_future()
+        self._reply_waiters[chat_id] = future
+        return future
+
+    def forget_file_ids(self):
+        """Make every issued file_id invalid, as after the file expired on Telegram's side."""
+        self.documents.clear()
+
+    def push_update(self, update: dict):
+        """Queue an update to be returned by the next getUpdates call."""
+        self.pending_updates.put_nowait(update)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        self.calls[method] += 1
+        form = await request.post()
+
+        if method == 'getUpdates':
+            return web.json_response({'ok': True, 'result': await self._get_updates(form)})
+
+        chat_id = form.get('chat_id')
+        if chat_id is not None:
+            now = time.monotonic()
+            self.replies[int(chat_id)].append((now, method))
+            waiter = self._reply_waiters.pop(int(chat_id), None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(now)
+
+        if method == 'sendDocument' and isinstance(form.get('document'), str) \
+                and form['document'] not in self.documents:
+            return web.json_response({
+                'ok': False, 'error_code': 400,
+                'description': 'Bad Request: wrong file identifier/HTTP URL specified'
+            }, status=400)
+        if method in MESSAGE_METHODS:
+            return web.json_response({'ok': True, 'result': self._message(form, method)})
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'CV Forge', 'username': 'cvforge_bench_bot'
+            }})
+        return web.json_response({'ok': True, 'result': True})
+
+    async def _get_updates(self, form) -> list:
+        timeout = float(form.get('timeout') or 0)
+        updates = []
+        try:
+            updates.append(await asyncio.wait_for(self.pending_updates.get(), timeout=timeout or 0.01))
+        except asyncio.TimeoutError:
+            return []
+        while not self.pending_updates.empty():
+            updates.append(self.pending_updates.get_nowait())
+        return updates
+
+    def _message(self, form, method: str) -> dict:
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(form.get('chat_id', 0)), 'type': 'private'},
+        }
+        if method == 'sendDocument':
+            document = form.get('document')
+            if isinstance(document, str):
+                self.file_id_sends += 1
+                message['document'] = self.documents[document]
+            else:
+                size = len(document.file.read()) if hasattr(document, 'file') else 0
+                self.uploaded_bytes += size
+                file_number = next(self._file_ids)
+                message['document'] = {
+                    'file_id': f"file-{file_number}",
+                    'file_unique_id': f"unique-{file_number}",
+                    'file_name': getattr(document, 'filename', None) or 'resume.pdf',
+                    'file_size': size,
+                }
+                self.documents[message['document']['file_id']] = message['document']
+            if form.get('caption'):
+                message['caption'] = form['caption']
+        else:
+            message['text'] = form.get('text', '')
+        return message
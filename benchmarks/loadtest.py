@@ -0,0 +1,330 @@
+"""End-to-end load test of the CVForm flow.
+
+Drives N simulated users through /start, every CVForm state (including the
+"⬅️ Back" and "➡️ Skip" paths) and the confirm_cv callback using the real
+routers. Telegram is replaced by a local fake Bot API server and the FSM
+storage by MemoryStorage (or a local Redis with --redis, optionally behind the
+in-process cache with --fsm-cache).
+
+With --regenerate every user taps "Generate" a second time, which sends the
+identical PDF again and exercises the Telegram file_id cache.
+
+With --compile-redis the bot sends compile jobs through the Redis queue
+(COMPILE_BACKEND=redis) to --workers compile workers running in this process,
+or with --workers 0 to separately started `python -m cvforgebot.worker`
+processes using the same Redis.
+
+Reports p50/p95/p99 latency per step and per compile (the compile_pool.submit
+call alone, the confirm_cv step also includes the database read and the
+upload), throughput and event loop lag, the number of Redis round trips made
+by the FSM storage and the PDF bytes uploaded to Telegram.
+Results can be saved and compared against a previous run.
+
+The generate rate limits are lifted unless GENERATE_USER_LIMIT or
+GENERATE_GLOBAL_LIMIT is set, so runs measure the compile path, not
+rejections and limiter waits.
+
+Usage (from the repository root):
+    python -m benchmarks.loadtest --users 50 --save baseline.json
+    python -m benchmarks.loadtest --users 50 --compare baseline.json
+    python -m benchmarks.loadtest --users 50 --redis redis://localhost:6379/15 --fsm-cache
+    python -m benchmarks.loadtest --users 50 --regenerate
+    python -m benchmarks.loadtest --users 50 --compile-redis redis://localhost:6379/15 --workers 2
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BENCH_TOKEN = '42:BENCHMARK'
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def summarize(values: list) -> dict:
+    return {
+        'count': len(values),
+        'p50_ms': percentile(values, 0.50) * 1000,
+        'p95_ms': percentile(values, 0.95) * 1000,
+        'p99_ms': percentile(values, 0.99) * 1000,
+    }
+
+
+class LoadTest:
+    def __init__(self, bot, dp, seed: int):
+        self.bot = bot
+        self.dp = dp
+        self.random = random.Random(seed)
+        self.update_ids = itertools.count(1)
+        self.latencies = defaultdict(list)
+        self.updates = 0
+
+    def _user(self, user_id: int) -> dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'}
+
+    def _message_update(self, user_id: int, text: str) -> dict:
+        return {
+            'update_id': next(self.update_ids),
+            'message': {
+                'message_id': next(self.update_ids),
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': self._user(user_id),
+                'text': text,
+            },
+        }
+
+    def _callback_update(self, user_id: int, data: str) -> dict:
+        return {
+            'update_id': next(self.update_ids),
+            'callback_query': {
+                'id': str(next(self.update_ids)),
+                'from': self._user(user_id),
+                'chat_instance': str(user_id),
+                'data': data,
+                'message': {
+                    'message_id': next(self.update_ids),
+                    'date': int(time.time()),
+                    'chat': {'id': user_id, 'type': 'private'},
+                    'text': 'summary',
+                },
+            },
+        }
+
+    async def send(self, step: str, update: dict):
+        start = time.perf_counter()
+        await self.dp.feed_raw_update(self.bot, update)
+        self.latencies[step].append(time.perf_counter() - start)
+        self.updates += 1
+
+    async def run_user(self, user_id: int, fields: list, back_rate: float, skip_rate: float,
+                       regenerate: bool = False):
+        await self.send('start', self._message_update(user_id, '/start'))
+        await self.send('start_filling', self._message_update(user_id, '📝 Start Filling'))
+
+        for index, field in enumerate(fields):
+            if index and self.random.random() < back_rate:
+                # Go back one step and answer it again
+                await self.send('back', self._message_update(user_id, '⬅️ Back'))
+                await self.send(fields[index - 1], self._message_update(user_id, f'{fields[index - 1]} again'))
+            if field != 'full_name' and self.random.random() < skip_rate:
+                await self.send('skip', self._message_update(user_id, '➡️ Skip'))
+                continue
+            # Unique names keep the PDF cache from short-circuiting compiles
+            text = f'User {user_id}' if field == 'full_name' else f'{field} of user {user_id}'
+            await self.send(field, self._message_update(user_id, text))
+
+        await self.send('confirm_cv', self._callback_update(user_id, 'confirm_cv'))
+        if regenerate:
+            await self.send('regenerate', self._callback_update(user_id, 'confirm_cv'))
+
+
+def counting_connection_class():
+    """Redis connection class counting round trips (a pipeline is one)."""
+    from redis.asyncio.connection import Connection
+
+    class CountingConnection(Connection):
+        round_trips = 0
+
+        async def send_packed_command(self, command, check_health=True):
+            CountingConnection.round_trips += 1
+            return await super().send_packed_command(command, check_health)
+
+    return CountingConnection
+
+
+async def monitor_loop_lag(samples: list, interval: float = 0.01):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval))
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> bool:
+    """Print p95 changes per step, return True if anything regressed."""
+    regressed = False
+    print(f"\n{'step':<24}{'baseline p95':>14}{'current p95':>14}{'change':>10}")
+    for step, stats in sorted(current['steps'].items()):
+        old = baseline.get('steps', {}).get(step)
+        if not old or not old['p95_ms']:
+            continue
+        change = (stats['p95_ms'] - old['p95_ms']) / old['p95_ms']
+        marker = ' !' if change > tolerance else ''
+        regressed |= change > tolerance
+        print(f"{step:<24}{old['p95_ms']:>12.1f}ms{stats['p95_ms']:>12.1f}ms{change:>+9.0%}{marker}")
+    old_tp = baseline.get('throughput_updates_per_s')
+    if old_tp:
+        change = (current['throughput_updates_per_s'] - old_tp) / old_tp
+        regressed |= change < -tolerance
+        print(f"{'throughput':<24}{old_tp:>12.1f}/s{current['throughput_updates_per_s']:>12.1f}/s{change:>+9.0%}")
+    return regressed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=0, help='max users in flight, 0 means all')
+    parser.add_argument('--back-rate', type=float, default=0.05)
+    parser.add_argument('--skip-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--redis', help='use RedisStorage at this URL instead of MemoryStorage')
+    parser.add_argument('--fsm-cache', action='store_true', help='put the in-process FSM cache in front of Redis')
+    parser.add_argument('--pdf-cache', action='store_true', help='keep the compiled PDF cache enabled')
+    parser.add_argument('--regenerate', action='store_true', help='generate every resume twice')
+    parser.add_argument('--compile-redis', help='send compile jobs through the Redis queue at this URL')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='compile worker slots run in this process with --compile-redis, 0 for external workers')
+    parser.add_argument('--save', help='write the results as JSON')
+    parser.add_argument('--compare', help='compare with a previously saved JSON result')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='cvforge-loadtest-')
+    # Settings are read at import time, so they have to be in place first
+    os.environ['DB_PATH'] = os.path.join(workdir, 'loadtest.db')
+    os.environ.setdefault('PDF_CACHE_ENABLED', '1' if args.pdf_cache else '0')
+    os.environ.setdefault('FILE_ID_CACHE', 'memory')
+    for name in ('GENERATE_USER_LIMIT', 'GENERATE_GLOBAL_LIMIT'):
+        os.environ.setdefault(name, '1000000000')
+    if args.compile_redis:
+        os.environ['COMPILE_BACKEND'] = 'redis'
+        os.environ['REDIS_DSN'] = args.compile_redis
+
+    from aiogram import Bot, Dispatcher
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from cvforgebot.fsm.states import CVForm
+    from cvforgebot.handlers import start, form, generate
+    from cvforgebot.handlers.form import form_stats, get_state_name
+    from cvforgebot.storage.db import db
+    from benchmarks.fake_telegram import FakeTelegramServer
+
+    server = FakeTelegramServer()
+    await server.start()
+
+    connection_class = None
+    if args.redis:
+        from aiogram.fsm.storage.redis import RedisStorage
+        from cvforgebot.fsm.storage import CachedRedisStorage
+        connection_class = counting_connection_class()
+        storage = RedisStorage.from_url(args.redis, connection_kwargs={'connection_class': connection_class})
+        if args.fsm_cache:
+            storage = CachedRedisStorage(storage)
+    else:
+        storage = MemoryStorage()
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(server.base_url))
+    bot = Bot(token=BENCH_TOKEN, session=session)
+    dp = Dispatcher(storage=storage)
+    dp.include_router(start.router)
+    dp.include_router(form.router)
+    dp.include_router(generate.router)
+
+    # Time the compile itself, apart from the rest of the confirm_cv handler
+    compile_timings = []
+    submit = generate.compile_pool.submit
+
+    async def timed_submit(*submit_args, **submit_kwargs):
+        start = time.perf_counter()
+        try:
+            return await submit(*submit_args, **submit_kwargs)
+        finally:
+            compile_timings.append(time.perf_counter() - start)
+    generate.compile_pool.submit = timed_submit
+
+    worker = worker_task = None
+    if args.compile_redis and args.workers:
+        from cvforgebot.latex.compiler import get_compiler
+        from cvforgebot.latex.queue import CompileWorker
+        worker = CompileWorker(get_compiler(), dsn=args.compile_redis, concurrency=args.workers)
+        worker_task = asyncio.create_task(worker.run())
+
+    fields = [get_state_name(state) for state in CVForm.__all_states__]
+    test = LoadTest(bot, dp, args.seed)
+    lag_samples = []
+    lag_task = asyncio.create_task(monitor_loop_lag(lag_samples))
+    limit = asyncio.Semaphore(args.concurrency or args.users)
+
+    async def user(user_id: int):
+        async with limit:
+            await test.run_user(user_id, fields, args.back_rate, args.skip_rate, args.regenerate)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(user(100000 + n) for n in range(args.users)))
+    elapsed = time.perf_counter() - start_time
+    lag_task.cancel()
+
+    completed = form_stats['completed_forms'] or 1
+    results = {
+        'users': args.users,
+        'elapsed_s': elapsed,
+        'throughput_updates_per_s': test.updates / elapsed,
+        'steps': {step: summarize(values) for step, values in test.latencies.items()},
+        'compile': summarize(compile_timings),
+        'event_loop_lag': summarize(lag_samples),
+        'db_transactions_per_resume': db.transactions / completed,
+        'api_calls': dict(server.calls),
+        'uploaded_bytes_per_user': server.uploaded_bytes / args.users,
+        'file_id_sends': server.file_id_sends,
+    }
+    if worker is not None:
+        from cvforgebot.utils.metrics import COMPILE_JOBS_EXPIRED
+        results['compile_jobs_expired'] = COMPILE_JOBS_EXPIRED.value()
+    if connection_class is not None:
+        results['fsm_round_trips_per_update'] = connection_class.round_trips / test.updates
+        results['fsm_round_trips_per_resume'] = connection_class.round_trips / args.users
+
+    print(f"{args.users} users, {test.updates} updates in {elapsed:.2f}s "
+          f"({results['throughput_updates_per_s']:.1f} updates/s)")
+    print(f"\n{'step':<24}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for step, stats in sorted(results['steps'].items()):
+        print(f"{step:<24}{stats['count']:>7}{stats['p50_ms']:>8.1f}ms{stats['p95_ms']:>8.1f}ms{stats['p99_ms']:>8.1f}ms")
+    compile_stats = results['compile']
+    print(f"\n{'compile':<24}{compile_stats['count']:>7}{compile_stats['p50_ms']:>8.1f}ms"
+          f"{compile_stats['p95_ms']:>8.1f}ms{compile_stats['p99_ms']:>8.1f}ms")
+    lag = results['event_loop_lag']
+    print(f"\nevent loop lag: p50={lag['p50_ms']:.1f}ms p95={lag['p95_ms']:.1f}ms p99={lag['p99_ms']:.1f}ms")
+    print(f"db transactions per resume: {results['db_transactions_per_resume']:.1f}")
+    print(f"uploaded bytes per user: {results['uploaded_bytes_per_user']:.0f}, "
+          f"{results['file_id_sends']} documents sent by file_id")
+    if 'compile_jobs_expired' in results:
+        print(f"compile jobs dropped after the bot stopped waiting: {results['compile_jobs_expired']:.0f}")
+    if connection_class is not None:
+        print(f"fsm redis round trips: {results['fsm_round_trips_per_update']:.2f} per update, "
+              f"{results['fsm_round_trips_per_resume']:.1f} per resume")
+
+    if worker is not None:
+        worker.stop()
+        await worker_task
+    if args.compile_redis:
+        await generate.compile_pool.close()
+    await db.close()
+    await bot.session.close()
+    await storage.close()
+    await server.stop()
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""PDF size and send time per output profile.
+
+Builds every fixture with every PDF profile and reports the file size, the
+time to upload it to a local fake Bot API server with sendDocument, and the
+estimated transfer time on a slow client link (--kbps). Profiles whose
+post-processor isn't installed are built without it and marked as such.
+
+Usage (from the repository root):
+    python -m benchmarks.pdf_size_bench --runs 3 --kbps 256
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from cvforgebot.latex.compiler import LaTeXCompiler
+from cvforgebot.latex.fixtures import FIXTURES
+from cvforgebot.latex.pdf_output import PDF_PROFILES, available_postprocessors
+
+BENCH_TOKEN = '42:BENCHMARK'
+BENCH_CHAT_ID = 1
+
+
+async def upload_seconds(bot, pdf_path: str, runs: int) -> float:
+    from aiogram import types
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await bot.send_document(BENCH_CHAT_ID, types.FSInputFile(pdf_path, filename='resume.pdf'))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=3, help="uploads timed per PDF")
+    parser.add_argument('--kbps', type=float, default=256, help="client link speed for the transfer estimate")
+    args = parser.parse_args()
+
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from benchmarks.fake_telegram import FakeTelegramServer
+
+    server = FakeTelegramServer()
+    await server.start()
+    bot = Bot(token=BENCH_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(server.base_url)))
+
+    compiler = LaTeXCompiler()
+    # Every profile has to be built, not served from the cache
+    compiler.cache = None
+    installed = available_postprocessors()
+    workdir = tempfile.mkdtemp(prefix='cvforge-pdfsize-')
+    baseline = {}
+    try:
+        for profile in PDF_PROFILES.values():
+            compiler.set_pdf_profile(profile.name)
+            label = profile.name
+            if profile.postprocess and not installed[profile.postprocess]:
+                label += f" (no {profile.postprocess})"
+            for fixture_name, data in FIXTURES.items():
+                build_dir = os.path.join(workdir, profile.name, fixture_name)
+                os.makedirs(build_dir)
+                start = time.perf_counter()
+                try:
+                    pdf_path = await compiler._generate_in(build_dir, data, 0)
+                except Exception as e:
+                    print(f"{label:<26} {fixture_name:<8} failed: {str(e).splitlines()[0]}")
+                    continue
+                build = time.perf_counter() - start
+
+                size = os.path.getsize(pdf_path)
+                baseline.setdefault(fixture_name, size)
+                upload = await upload_seconds(bot, pdf_path, args.runs)
+                transfer = size * 8 / (args.kbps * 1000)
+                print(
+                    f"{label:<26} {fixture_name:<8} size={size / 1024:.1f}KiB "
+                    f"({size / baseline[fixture_name] * 100:.0f}%) build={build * 1000:.0f}ms "
+                    f"upload={upload * 1000:.1f}ms transfer@{args.kbps:g}kbps={transfer * 1000:.0f}ms"
+                )
+    finally:
+        await bot.session.close()
+        await server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
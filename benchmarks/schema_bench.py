@@ -0,0 +1,119 @@
+"""Database size and get_user_data latency for the two storage layouts.
+
+Bulk-loads USERS users with EDUCATION and EXPERIENCE entries each into the
+"tables" layout (child tables) and the "document" layout (one JSON document
+per user), then fetches random users through Database.get_user_data.
+
+Usage (from the repository root):
+    python -m benchmarks.schema_bench --users 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.loadtest import summarize
+from cvforgebot.storage.db import Database, ENTRY_FIELDS, PROFILE_FIELDS
+
+BATCH = 10000
+
+
+def profile(user_id: int) -> dict:
+    return {field: f"{field} of user {user_id}" for field in PROFILE_FIELDS}
+
+
+def entries(user_id: int, table: str, count: int) -> list:
+    return [
+        {column: f"{column} {number} of user {user_id}" for column in ENTRY_FIELDS[table]}
+        for number in range(count)
+    ]
+
+
+def load(db_name: str, layout: str, users: int, counts: dict):
+    """Fill the database with plain sqlite3 in large transactions."""
+    conn = sqlite3.connect(db_name)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=OFF')
+    for batch_start in range(0, users, BATCH):
+        user_ids = range(batch_start, min(users, batch_start + BATCH))
+        if layout == 'document':
+            rows = []
+            for user_id in user_ids:
+                document = profile(user_id)
+                for table, count in counts.items():
+                    document[table] = entries(user_id, table, count)
+                rows.append((user_id, json.dumps(document, separators=(',', ':'))))
+            conn.executemany('INSERT INTO cv_documents (user_id, doc) VALUES (?, ?)', rows)
+        else:
+            conn.executemany(
+                f'INSERT INTO user_data (user_id, {", ".join(PROFILE_FIELDS)}) '
+                f'VALUES (?{", ?" * len(PROFILE_FIELDS)})',
+                ([user_id] + list(profile(user_id).values()) for user_id in user_ids)
+            )
+            for table, count in counts.items():
+                columns = ENTRY_FIELDS[table]
+                conn.executemany(
+                    f'INSERT INTO {table} (user_id, entry_no, {", ".join(columns)}) '
+                    f'VALUES (?, ?{", ?" * len(columns)})',
+                    (
+                        [user_id, number] + list(entry.values())
+                        for user_id in user_ids
+                        for number, entry in enumerate(entries(user_id, table, count))
+                    )
+                )
+        conn.commit()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+
+
+async def fetch(db_name: str, layout: str, users: int, samples: int) -> list:
+    db = Database(db_name, layout)
+    user_ids = random.Random(1).sample(range(users), min(samples, users))
+    await db.get_user_data(user_ids[0])
+    latencies = []
+    for user_id in user_ids:
+        start = time.perf_counter()
+        await db.get_user_data(user_id)
+        latencies.append(time.perf_counter() - start)
+    await db.close()
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--education', type=int, default=2)
+    parser.add_argument('--experience', type=int, default=3)
+    parser.add_argument('--samples', type=int, default=5000)
+    parser.add_argument('--dir', help='where to create the databases (default: a temporary directory)')
+    args = parser.parse_args()
+    counts = {'education': args.education, 'experience': args.experience}
+    workdir = args.dir or tempfile.mkdtemp(prefix='cvforge-schema-')
+
+    for layout in ('tables', 'document'):
+        db_name = os.path.join(workdir, f'{layout}.db')
+        # Create the latest schema through the migrations
+        schema_db = Database(db_name, layout)
+        await schema_db._connection()
+        await schema_db.close()
+
+        start = time.perf_counter()
+        load(db_name, layout, args.users, counts)
+        load_time = time.perf_counter() - start
+        size = os.path.getsize(db_name)
+
+        stats = summarize(await fetch(db_name, layout, args.users, args.samples))
+        print(
+            f"{layout:<9} {args.users} users loaded in {load_time:.1f}s, "
+            f"{size / 1024 / 1024:.0f} MB ({size / args.users:.0f} B/user), "
+            f"get_user_data p50={stats['p50_ms']:.3f}ms p95={stats['p95_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms"
+        )
+        os.remove(db_name)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""Process startup time: importing the bot modules and rendering the first resume.
+
+Each sample runs in a fresh interpreter, like a restarted bot or a new worker.
+The first render is measured with a cold and a warm Jinja bytecode cache.
+
+Usage (from the repository root):
+    python -m benchmarks.startup_bench --runs 5
+"""
+import argparse
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+
+PROBE = '''
+import json, time
+start = time.perf_counter()
+import cvforgebot.handlers.start, cvforgebot.handlers.form, cvforgebot.handlers.generate
+imported = time.perf_counter()
+from cvforgebot.latex.compiler import get_compiler
+from cvforgebot.latex.fixtures import SAMPLE_CV
+compiler = get_compiler()
+compiler.templates.get().render(compiler._prepare_data(dict(SAMPLE_CV)))
+rendered = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_render": rendered - imported}))
+'''
+
+
+def sample() -> dict:
+    output = subprocess.run([sys.executable, '-c', PROBE], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def report(label: str, samples: list):
+    for key in ('import', 'first_render'):
+        values = [s[key] * 1000 for s in samples]
+        print(f"{label:<12} {key:<13} median={statistics.median(values):.1f}ms min={min(values):.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    from cvforgebot.latex.compiler import get_compiler
+    cache_dir = get_compiler().env.bytecode_cache.directory
+
+    cold = []
+    for _ in range(args.runs):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        cold.append(sample())
+    report('cold cache', cold)
+
+    warm = [sample() for _ in range(args.runs)]
+    report('warm cache', warm)
+
+
+if __name__ == '__main__':
+    main()
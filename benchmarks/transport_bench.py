@@ -0,0 +1,111 @@
+"""Update-handling latency with long polling versus webhook delivery.
+
+Sends /start updates to the real routers, either queued for getUpdates on the
+fake Bot API server (polling) or POSTed to the webhook app (webhook), and
+measures the time until the bot's reply reaches the fake server.
+
+Usage (from the repository root):
+    python -m benchmarks.transport_bench --updates 200
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+
+from benchmarks.loadtest import BENCH_TOKEN, summarize
+
+WEBHOOK_PATH = '/webhook'
+
+
+def start_update(update_id: int, user_id: int) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'},
+            'text': '/start',
+        },
+    }
+
+
+async def measure(server, deliver, updates: int, ids) -> list:
+    latencies = []
+    for _ in range(updates):
+        update_id = next(ids)
+        user_id = 200000 + update_id
+        reply = server.wait_for_reply(user_id)
+        start = time.monotonic()
+        await deliver(start_update(update_id, user_id))
+        latencies.append(await asyncio.wait_for(reply, timeout=10) - start)
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--updates', type=int, default=200)
+    parser.add_argument('--webhook-port', type=int, default=8181)
+    args = parser.parse_args()
+
+    os.environ['DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='cvforge-transport-'), 'bench.db')
+
+    import aiohttp
+    from aiohttp import web
+    from aiogram import Bot, Dispatcher
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+    from cvforgebot.handlers import start, form, generate
+    from benchmarks.fake_telegram import FakeTelegramServer
+
+    server = FakeTelegramServer()
+    await server.start()
+    session = AiohttpSession(api=TelegramAPIServer.from_base(server.base_url))
+    bot = Bot(token=BENCH_TOKEN, session=session)
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.include_router(start.router)
+    dp.include_router(form.router)
+    dp.include_router(generate.router)
+    ids = itertools.count(1)
+
+    # Long polling against the fake getUpdates
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, close_bot_session=False))
+
+    async def push(update: dict):
+        server.push_update(update)
+
+    polling_latencies = await measure(server, push, args.updates, ids)
+    await dp.stop_polling()
+    await polling
+
+    # Webhook app on a local port
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot).register(app, path=WEBHOOK_PATH)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', args.webhook_port).start()
+    url = f'http://127.0.0.1:{args.webhook_port}{WEBHOOK_PATH}'
+
+    async with aiohttp.ClientSession() as client:
+        async def post(update: dict):
+            async with client.post(url, json=update) as response:
+                await response.read()
+
+        webhook_latencies = await measure(server, post, args.updates, ids)
+
+    await runner.cleanup()
+    await bot.session.close()
+    await server.stop()
+
+    for label, values in (('polling', polling_latencies), ('webhook', webhook_latencies)):
+        stats = summarize(values)
+        print(f"{label:<8} n={stats['count']} p50={stats['p50_ms']:.2f}ms "
+              f"p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,311 @@
+"""Batch resume generation.
+
+Reads candidates from a CSV or JSONL file or from the bot's database,
+validates them with the UserCV model and compiles them on all cores:
+
+    python -m cvforgebot.batch --csv candidates.csv --out resumes.zip
+    python -m cvforgebot.batch --jsonl candidates.jsonl --out resumes/ --workers 8
+    python -m cvforgebot.batch --db user_data.db --out resumes.zip
+
+CSV columns use the form field names (full_name, email, education_degree, ...)
+and fill one education and experience entry. JSONL records use the shape of
+Database.get_user_data, with lists of entries. An `id` column or key names the
+output file, the record number is used otherwise, and an optional `template`
+column or key picks the template.
+
+Records are read lazily and at most a few jobs per worker are in flight, so
+memory use doesn't depend on the input size. Records that can't be parsed,
+don't validate, have an id already used by another record or fail to compile
+are written to errors.jsonl next to the output, the run goes on.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator, Tuple, Union
+
+from pydantic import ValidationError
+
+from cvforgebot.config import COMPILE_CONCURRENCY
+from cvforgebot.models.user_data import UserCV
+from cvforgebot.storage.db import ENTRY_FIELDS, Database, normalize_cv
+
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(asctime)s %(levelname)s %(name)s %(message)s"
+)
+
+# Jobs queued per worker process, keeps every core busy without reading ahead further
+JOBS_PER_WORKER = 2
+
+# Characters allowed in output file names
+SAFE_NAME = re.compile(r'[^\w.-]')
+
+
+class RecordError(Exception):
+    """A record that can't be used, yielded by the readers in place of its data.
+
+    `stage` is "read" for records that can't be parsed and "validate" for
+    records that don't have the expected shape.
+    """
+
+    def __init__(self, stage: str, message: str):
+        super().__init__(message)
+        self.stage = stage
+
+
+Records = Iterator[Tuple[str, Union[dict, RecordError]]]
+
+
+def safe_name(record_id: str) -> str:
+    """Record id usable as a file name and as a build directory name."""
+    name = SAFE_NAME.sub('_', record_id)
+    # Never "." or "..", or a hidden file
+    return f"_{name[1:]}" if name.startswith('.') else name
+
+
+def _normalize(record: dict, education, experience):
+    try:
+        return normalize_cv(record, education, experience)
+    except Exception as e:
+        return RecordError('validate', f"Unexpected record shape: {e!r}")
+
+
+def read_csv(path: str) -> Records:
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for number, row in enumerate(csv.DictReader(f), 1):
+            entries = {
+                table: [{column: row.get(f"{table}_{column}") for column in columns}]
+                for table, columns in ENTRY_FIELDS.items()
+            }
+            record_id = row.get('id') or str(number)
+            yield record_id, _normalize(row, entries['education'], entries['experience'])
+
+
+def read_jsonl(path: str) -> Records:
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield str(number), RecordError('read', f"Invalid JSON: {e}")
+                continue
+            if not isinstance(record, dict):
+                yield str(number), RecordError('read', f"Expected a JSON object, got {type(record).__name__}")
+                continue
+            record_id = str(record.get('id') or number)
+            yield record_id, _normalize(record, record.get('education') or [], record.get('experience') or [])
+
+
+def read_db(path: str) -> Records:
+    """Read users of the bot's database, one at a time."""
+    database = Database(path)
+
+    async def user_ids(after: int):
+        conn = await database._connection()
+        table = 'cv_documents' if database.layout == 'document' else 'user_data'
+        async with conn.execute(
+            f'SELECT user_id FROM {table} WHERE user_id > ? ORDER BY user_id LIMIT 1000', (after,)
+        ) as cursor:
+            return [row[0] for row in await cursor.fetchall()]
+
+    loop = asyncio.new_event_loop()
+    try:
+        last = -1
+        # Page through the ids so huge tables aren't loaded at once
+        while True:
+            page = loop.run_until_complete(user_ids(last))
+            if not page:
+                break
+            for user_id in page:
+                try:
+                    data = loop.run_until_complete(database.get_user_data(user_id))
+                except Exception as e:
+                    yield str(user_id), RecordError('read', f"Can't load the stored data: {e!r}")
+                    continue
+                if data is not None:
+                    yield str(user_id), data
+            last = page[-1]
+    finally:
+        loop.run_until_complete(database.close())
+        loop.close()
+
+
+def _items(value) -> list:
+    """Comma-separated text or a list of values as a list of non-empty strings."""
+    if isinstance(value, str):
+        value = value.split(',')
+    elif not isinstance(value, (list, tuple)):
+        raise ValueError(f"Expected text or a list, got {type(value).__name__}")
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def validate(data: dict):
+    """Check a record against UserCV, raising ValidationError or ValueError."""
+    UserCV(**{
+        **data,
+        'skills': _items(data['skills']),
+        'languages': _items(data['languages']),
+    })
+
+
+# Per worker process
+_compiler = None
+
+
+def _init_worker():
+    global _compiler
+    from cvforgebot.latex.compiler import get_compiler
+    _compiler = get_compiler()
+    # Batch records are one-offs, don't keep per-user build state around
+    _compiler.incremental = False
+
+
+def _compile(name: str, data: dict) -> bytes:
+    # The sanitized name doubles as the build id, it ends up in directory names
+    return asyncio.run(_compiler.build_pdf(data, name))
+
+
+class Output:
+    """Writes PDFs to a directory or, for a .zip path, into a zip archive."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.zip = None
+        if path.endswith('.zip'):
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # PDFs are already compressed
+            self.zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED)
+            self.report_dir = os.path.dirname(os.path.abspath(path))
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.report_dir = path
+        self.errors = open(os.path.join(self.report_dir, 'errors.jsonl'), 'w', encoding='utf-8')
+
+    def write(self, name: str, pdf_bytes: bytes):
+        """Write the PDF of the record with this safe_name."""
+        file_name = f"resume_{name}.pdf"
+        if self.zip is not None:
+            self.zip.writestr(file_name, pdf_bytes)
+        else:
+            with open(os.path.join(self.path, file_name), 'wb') as f:
+                f.write(pdf_bytes)
+
+    def error(self, record_id: str, stage: str, message: str):
+        self.errors.write(json.dumps({'id': record_id, 'stage': stage, 'error': message}) + '\n')
+        self.errors.flush()
+
+    def close(self):
+        if self.zip is not None:
+            self.zip.close()
+        self.errors.close()
+
+
+def run(records: Records, output: Output, workers: int) -> dict:
+    stats = {'ok': 0, 'invalid': 0, 'failed': 0}
+    start = time.perf_counter()
+
+    def progress():
+        done = sum(stats.values())
+        rate = done / max(time.perf_counter() - start, 1e-9)
+        print(f"\r{done} records: {stats['ok']} ok, {stats['invalid']} invalid, "
+              f"{stats['failed']} failed ({rate:.1f}/s)", end='', file=sys.stderr, flush=True)
+
+    # Build the preamble format once here, so the workers don't race to build it
+    from cvforgebot.latex.compiler import warm_up_compiler
+    asyncio.run(warm_up_compiler())
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = {}
+
+        # Output names already taken, ids that differ can still sanitize to the same name
+        names = {}
+
+        def collect(futures):
+            for future in futures:
+                record_id, name = pending.pop(future)
+                try:
+                    output.write(name, future.result())
+                    stats['ok'] += 1
+                except Exception as e:
+                    output.error(record_id, 'compile', str(e))
+                    stats['failed'] += 1
+                progress()
+
+        def reject(record_id: str, stage: str, message: str):
+            output.error(record_id, stage, message)
+            stats['invalid'] += 1
+            progress()
+
+        for record_id, data in records:
+            if isinstance(data, RecordError):
+                reject(record_id, data.stage, str(data))
+                continue
+            try:
+                validate(data)
+            except ValidationError as e:
+                reject(record_id, 'validate', str(e))
+                continue
+            except Exception as e:
+                reject(record_id, 'validate', f"Unexpected record shape: {e!r}")
+                continue
+
+            name = safe_name(record_id)
+            if name in names:
+                reject(record_id, 'validate', f"Id collides with record {names[name]!r}, both would be resume_{name}.pdf")
+                continue
+            names[name] = record_id
+
+            pending[pool.submit(_compile, name, data)] = record_id, name
+            if len(pending) >= workers * JOBS_PER_WORKER:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        if pending:
+            collect(wait(pending)[0])
+
+    print(file=sys.stderr)
+    stats['elapsed_s'] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate resumes in bulk")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--csv', help="CSV file with one candidate per row")
+    source.add_argument('--jsonl', help="JSONL file with one candidate per line")
+    source.add_argument('--db', help="SQLite database of the bot")
+    parser.add_argument('--out', required=True, help="output directory, or a .zip file")
+    parser.add_argument('--workers', type=int, default=COMPILE_CONCURRENCY,
+                        help="compile processes (default: CPU count)")
+    args = parser.parse_args()
+
+    if args.csv:
+        records = read_csv(args.csv)
+    elif args.jsonl:
+        records = read_jsonl(args.jsonl)
+    else:
+        records = read_db(args.db)
+
+    output = Output(args.out)
+    try:
+        stats = run(records, output, max(1, args.workers))
+    finally:
+        output.close()
+    print(f"{stats['ok']} resumes written to {args.out} in {stats['elapsed_s']:.1f}s, "
+          f"{stats['invalid']} invalid and {stats['failed']} failed records "
+          f"(see {os.path.join(output.report_dir, 'errors.jsonl')})")
+    sys.exit(1 if stats['invalid'] or stats['failed'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,140 @@
 import asyncio
 import logging
+from aiohttp import web
 from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramRetryAfter
 from aiogram.fsm.storage.redis import RedisStorage
-from cvforgebot.config import BOT_TOKEN, REDIS_DSN
-from cvforgebot.handlers import start, form, generate
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from cvforgebot.config import (
+    BOT_TOKEN, REDIS_DSN, FSM_CACHE_SIZE, FSM_CACHE_TRUST_TTL, METRICS_HOST, METRICS_PORT,
+    BOT_MODE, WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT
+)
+from cvforgebot.fsm.storage import CachedRedisStorage
+from cvforgebot.handlers import debug, start, form, generate
+from cvforgebot.latex.compiler import get_compiler, warm_up_compiler
+from cvforgebot.storage.db import db
+from cvforgebot.utils.metrics import start_metrics_server
+from cvforgebot.utils.middlewares import MetricsMiddleware, ProfilingMiddleware
+from cvforgebot.utils.profiling import install_signal_handler
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(name)s %(message)s"
+)
+logger = logging.getLogger(__name__)
 
-# Initialize bot and dispatcher
-async def main():
+async def on_startup(dispatcher: Dispatcher):
+    # Precompile the LaTeX preamble in the background
+    dispatcher['warm_up_task'] = asyncio.create_task(warm_up_compiler())
+    # Recover crash leftovers now, then keep output/ within its TTL and quota
+    dispatcher['sweeper_task'] = asyncio.create_task(get_compiler().create_sweeper().run())
+    # Answers kept for editing are deleted after USER_DATA_RETENTION
+    dispatcher['retention_task'] = asyncio.create_task(db.run_retention())
+
+    if METRICS_PORT:
+        dispatcher['metrics_runner'] = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+
+    # `kill -USR1 <pid>` profiles the running bot
+    install_signal_handler()
+
+async def on_shutdown(dispatcher: Dispatcher):
+    dispatcher['warm_up_task'].cancel()
+    dispatcher['sweeper_task'].cancel()
+    dispatcher['retention_task'].cancel()
+    if 'metrics_runner' in dispatcher.workflow_data:
+        await dispatcher['metrics_runner'].cleanup()
+
+    # Close the database connection and FSM storage
+    await db.close()
+    await dispatcher.storage.close()
+
+def create_dispatcher() -> Dispatcher:
     # Initialize Redis storage
     storage = RedisStorage.from_url(REDIS_DSN)
-    
-    # Initialize bot and dispatcher
-    bot = Bot(token="7341551375:AAFzI-4i2xplMLRckSfjgKnvZNch6fnrW6E")
+    if FSM_CACHE_SIZE:
+        storage = CachedRedisStorage(storage, max_entries=FSM_CACHE_SIZE, trust_ttl=FSM_CACHE_TRUST_TTL)
     dp = Dispatcher(storage=storage)
-    
-    # Register handlers
+
+    # Register handlers, /debug first so it works in any form state
+    dp.include_router(debug.router)
     dp.include_router(start.router)
     dp.include_router(form.router)
     dp.include_router(generate.router)
-    
+
+    # Handler latency metrics
+    dp.message.middleware(MetricsMiddleware('message'))
+    dp.callback_query.middleware(MetricsMiddleware('callback_query'))
+    # Handler time per state while a profiling session runs
+    dp.message.middleware(ProfilingMiddleware('message'))
+    dp.callback_query.middleware(ProfilingMiddleware('callback_query'))
+
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    return dp
+
+def create_bot() -> Bot:
+    if not BOT_TOKEN:
+        raise RuntimeError("BOT_TOKEN is not set")
+    return Bot(token=BOT_TOKEN)
+
+async def run_polling():
+    bot = create_bot()
+    dp = create_dispatcher()
+
     # Start polling
     await bot.delete_webhook(drop_pending_updates=True)
     await dp.start_polling(bot)
 
+def create_webhook_app(bot: Bot, dp: Dispatcher) -> web.Application:
+    """Build the aiohttp app serving Telegram webhook updates.
+
+    Replicas are stateless, all FSM data lives in Redis. A replica registers
+    the webhook on startup unless it is already set up the same way, and
+    leaves it in place on shutdown, so stopping one replica doesn't cut off
+    the others. The secret token isn't part of the webhook info, rotating
+    WEBHOOK_SECRET alone needs the webhook deleted first.
+    """
+    async def set_webhook(bot: Bot):
+        url = f"{WEBHOOK_BASE_URL}{WEBHOOK_PATH}"
+        allowed_updates = dp.resolve_used_update_types()
+        info = await bot.get_webhook_info()
+        if info.url == url and sorted(info.allowed_updates or []) == sorted(allowed_updates):
+            return
+        try:
+            await bot.set_webhook(url, secret_token=WEBHOOK_SECRET, allowed_updates=allowed_updates)
+        except TelegramRetryAfter:
+            # Replicas starting together, one of the others has just set it
+            logger.warning("Webhook update rate limited, leaving it to the other replicas")
+    dp.startup.register(set_webhook)
+
+    app = web.Application()
+    handler = SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET)
+    handler.register(app, path=WEBHOOK_PATH)
+
+    async def finish_updates(app: web.Application):
+        # Let updates that are still being handled finish before the dispatcher shuts down
+        tasks = getattr(handler, '_background_feed_update_tasks', ())
+        if tasks:
+            await asyncio.wait(list(tasks), timeout=25)
+    app.on_shutdown.append(finish_updates)
+
+    async def health(request):
+        return web.Response(text="ok")
+    app.router.add_get("/healthz", health)
+
+    setup_application(app, dp, bot=bot)
+    return app
+
+def run_webhook():
+    bot = create_bot()
+    dp = create_dispatcher()
+    app = create_webhook_app(bot, dp)
+    # run_app handles SIGTERM and waits for in-flight requests before shutdown
+    web.run_app(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT, shutdown_timeout=30)
+
 if __name__ == '__main__':
-    asyncio.run(main()) 
\ No newline at end of file
+    if BOT_MODE == 'webhook':
+        run_webhook()
+    else:
+        asyncio.run(run_polling())
@@ -6,9 +6,144 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 REDIS_DSN = os.getenv("REDIS_DSN", "redis://localhost:6379/0")
 
+# In-process cache in front of the Redis FSM storage, 0 disables it.
+# Cached records are trusted for FSM_CACHE_TRUST_TTL seconds before being revalidated.
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+FSM_CACHE_TRUST_TTL = float(os.getenv("FSM_CACHE_TRUST_TTL", "1.0"))
+
+# "polling" or "webhook". In webhook mode any number of replicas can run
+# behind a load balancer, they share the Redis FSM storage.
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+
+# SQLite database with the form answers
+DB_PATH = os.getenv("DB_PATH", "user_data.db")
+# "tables" stores education and experience entries in child tables,
+# "document" stores every CV as one compact JSON document
+DB_LAYOUT = os.getenv("DB_LAYOUT", "tables")
+# Answers are kept after generation so the resume can be edited. They're deleted
+# once unchanged for USER_DATA_RETENTION seconds (0 keeps them), checked every
+# USER_DATA_RETENTION_INTERVAL seconds.
+USER_DATA_RETENTION = int(os.getenv("USER_DATA_RETENTION", str(30 * 24 * 3600)))
+USER_DATA_RETENTION_INTERVAL = int(os.getenv("USER_DATA_RETENTION_INTERVAL", "3600"))
+
+# "write_through" saves every form answer to the database right away,
+# "write_behind" keeps answers in the FSM data and flushes them in one transaction
+# at the summary or every FORM_CHECKPOINT_EVERY answers
+FORM_WRITE_MODE = os.getenv("FORM_WRITE_MODE", "write_behind")
+FORM_CHECKPOINT_EVERY = int(os.getenv("FORM_CHECKPOINT_EVERY", "6"))
+
 # LaTeX related settings
 LATEX_OUTPUT_DIR = "output"
 TEMPLATE_DIR = "templates"
+# Jinja bytecode cache, lets new processes skip template compilation
+TEMPLATE_CACHE_DIR = "template_cache"
+# Template used when the user hasn't picked one
+DEFAULT_TEMPLATE = os.getenv("DEFAULT_TEMPLATE", "cv_template.tex.j2")
+# How often templates/ is checked for new and changed templates, in seconds, 0 disables
+TEMPLATE_RELOAD_INTERVAL = float(os.getenv("TEMPLATE_RELOAD_INTERVAL", "5"))
+LATEX_MAX_PASSES = int(os.getenv("LATEX_MAX_PASSES", "3"))
+
+# TeX engine: pdflatex, xelatex, lualatex, tectonic, a comma-separated list in
+# order of preference, or "auto" for the fastest correct engine per template as
+# ranked by `python -m cvforgebot.latex.engines --save`. Missing engines are skipped.
+LATEX_ENGINE = os.getenv("LATEX_ENGINE", "auto")
+LATEX_ENGINE_RANKING = os.getenv("LATEX_ENGINE_RANKING", "engine_ranking.json")
+
+# PDF output profile (latex/pdf_output.py): "standard" keeps the engine defaults,
+# "small" compresses streams and objects and drops dates and IDs, "smallest"
+# also runs qpdf, "distilled" runs ghostscript to subset fonts
+PDF_PROFILE = os.getenv("PDF_PROFILE", "small")
+PDF_POSTPROCESS_TIMEOUT = float(os.getenv("PDF_POSTPROCESS_TIMEOUT", "20"))
+
+# Limits for every TeX engine run: wall-clock seconds per pass, CPU seconds,
+# address space and largest written file in MB
+LATEX_PASS_TIMEOUT = float(os.getenv("LATEX_PASS_TIMEOUT", "20"))
+LATEX_CPU_LIMIT = int(os.getenv("LATEX_CPU_LIMIT", "30"))
+LATEX_MEMORY_LIMIT = int(os.getenv("LATEX_MEMORY_LIMIT", "1024"))
+LATEX_OUTPUT_LIMIT = int(os.getenv("LATEX_OUTPUT_LIMIT", "50"))
+# Form data larger than this is rejected before rendering
+LATEX_MAX_FIELD_CHARS = int(os.getenv("LATEX_MAX_FIELD_CHARS", "2000"))
+LATEX_MAX_INPUT_CHARS = int(os.getenv("LATEX_MAX_INPUT_CHARS", "20000"))
+
+# Escape the whole data tree once before rendering instead of per |e filter
+LATEX_PREESCAPE = os.getenv("LATEX_PREESCAPE", "1") == "1"
+
+# "memory" builds each job in a RAM-backed scratch directory and returns the PDF bytes,
+# the PDF cache and incremental build state live there too, nothing is written to
+# persistent disk per job. "disk" keeps the build files and PDF under output/<user_id>/
+LATEX_BUILD_MODE = os.getenv("LATEX_BUILD_MODE", "memory")
+LATEX_SCRATCH_DIR = os.getenv("LATEX_SCRATCH_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else None)
+
+# output/<user_id>/ and cvforge-state/<user_id>/ directories are removed after
+# OUTPUT_TTL seconds, or least recently used first while either is over OUTPUT_MAX_BYTES. Build files and
+# scratch directories older than OUTPUT_LEFTOVER_AGE seconds are crash leftovers.
+OUTPUT_TTL = int(os.getenv("OUTPUT_TTL", str(24 * 3600)))
+OUTPUT_MAX_BYTES = int(os.getenv("OUTPUT_MAX_BYTES", str(500 * 1024 * 1024)))
+OUTPUT_SWEEP_INTERVAL = int(os.getenv("OUTPUT_SWEEP_INTERVAL", "600"))
+OUTPUT_LEFTOVER_AGE = int(os.getenv("OUTPUT_LEFTOVER_AGE", "600"))
+
+# Keep each user's last .aux and PDF so an edited resume compiles in one pass and
+# an unchanged one isn't compiled at all. They're kept in output/<user_id>/ in disk
+# mode and in the scratch directory under cvforge-state/<user_id>/ in memory mode.
+LATEX_INCREMENTAL = os.getenv("LATEX_INCREMENTAL", "1") == "1"
+
+# Precompiled preamble formats (.fmt), needs the mylatexformat package
+LATEX_USE_FORMAT = os.getenv("LATEX_USE_FORMAT", "1") == "1"
+LATEX_FORMAT_DIR = "formats"
+
+# Compile worker pool settings
+COMPILE_CONCURRENCY = int(os.getenv("COMPILE_CONCURRENCY", os.cpu_count() or 1))
+COMPILE_QUEUE_SIZE = int(os.getenv("COMPILE_QUEUE_SIZE", "20"))
+
+# "local" compiles inside the bot process, "redis" sends jobs to
+# compile workers started with `python -m cvforgebot.worker`
+COMPILE_BACKEND = os.getenv("COMPILE_BACKEND", "local")
+COMPILE_JOB_TIMEOUT = int(os.getenv("COMPILE_JOB_TIMEOUT", "60"))
+COMPILE_JOB_RETRIES = int(os.getenv("COMPILE_JOB_RETRIES", "2"))
+COMPILE_RESULT_TIMEOUT = int(os.getenv("COMPILE_RESULT_TIMEOUT", "180"))
+WORKER_HEARTBEAT_INTERVAL = int(os.getenv("WORKER_HEARTBEAT_INTERVAL", "10"))
+
+# Admission control for "Generate PDF": per-user and global token buckets.
+# Requests over the global limit wait up to GENERATE_MAX_DELAY seconds, then get rejected.
+GENERATE_USER_LIMIT = int(os.getenv("GENERATE_USER_LIMIT", "3"))
+GENERATE_USER_WINDOW = int(os.getenv("GENERATE_USER_WINDOW", "60"))
+GENERATE_GLOBAL_LIMIT = int(os.getenv("GENERATE_GLOBAL_LIMIT", "120"))
+GENERATE_GLOBAL_WINDOW = int(os.getenv("GENERATE_GLOBAL_WINDOW", "60"))
+GENERATE_MAX_DELAY = float(os.getenv("GENERATE_MAX_DELAY", "5"))
+
+# Compiled PDF cache settings. In memory build mode the cache lives in the
+# scratch directory under cvforge-cache/, in disk mode in PDF_CACHE_DIR.
+PDF_CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "1") == "1"
+PDF_CACHE_DIR = "cache"
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# Telegram file_ids of sent PDFs, so an identical document isn't uploaded again.
+# "redis" shares them between replicas, "sqlite" keeps them in DB_PATH,
+# "memory" per process, "off" disables.
+FILE_ID_CACHE = os.getenv("FILE_ID_CACHE", "redis")
+FILE_ID_CACHE_SIZE = int(os.getenv("FILE_ID_CACHE_SIZE", "10000"))
+FILE_ID_TTL = int(os.getenv("FILE_ID_TTL", str(30 * 24 * 3600)))
+
+# Telegram user ids allowed to use /debug, comma-separated
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
+
+# On-demand profiling (/debug profile, SIGUSR1): where profiles are written,
+# entries per summary table, longest session, session length on SIGUSR1 and
+# stack depth recorded per allocation
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "300"))
+PROFILE_SIGNAL_SECONDS = int(os.getenv("PROFILE_SIGNAL_SECONDS", "30"))
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1"))
+
+# Prometheus /metrics endpoint, disabled when the port is 0
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
 
 # Create necessary directories if they don't exist
 os.makedirs(LATEX_OUTPUT_DIR, exist_ok=True)
\ No newline at end of file
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+
+from ..utils.metrics import FSM_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Replicas announce the keys they changed on this channel
+INVALIDATE_CHANNEL = "cvforge:fsm:invalidate"
+
+# Expiry of version keys when state or data never expire. An expired version
+# restarts at 1, cached copies with another version are refetched.
+VERSION_TTL = 7 * 24 * 3600
+
+
+def _seconds(ttl) -> Optional[int]:
+    if isinstance(ttl, timedelta):
+        return int(ttl.total_seconds())
+    return ttl
+
+
+class CachedRedisStorage(BaseStorage):
+    """FSM storage keeping a bounded in-process copy of RedisStorage records.
+
+    Redis stays the source of truth. Every write bumps a per-key version
+    counter in the same pipeline as the state/data change, so a write is one
+    round trip, and announces the key on INVALIDATE_CHANNEL so other replicas
+    drop their copy.
+
+    A cached entry is trusted for `trust_ttl` seconds after it was last
+    confirmed, which covers the get_state/get_data/update_data calls made
+    while handling one update. After that a read costs one GET of the version
+    key; only a changed version refetches state and data. A miss fetches both
+    in a single pipeline instead of two separate round trips.
+
+    Version keys expire with the longer of the state and data TTLs, so they
+    don't outlive the records they version.
+    """
+
+    def __init__(self, storage: RedisStorage, max_entries: int = 10000, trust_ttl: float = 1.0):
+        self.storage = storage
+        self.redis = storage.redis
+        self.max_entries = max_entries
+        self.trust_ttl = trust_ttl
+        self.replica_id = uuid.uuid4().hex
+        ttls = [_seconds(storage.state_ttl), _seconds(storage.data_ttl)]
+        self.version_ttl = VERSION_TTL if None in ttls else max(ttls)
+        # redis key prefix -> [state, raw data json, version, last confirmed]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._listener: Optional[asyncio.Task] = None
+
+    def _keys(self, key: StorageKey):
+        build = self.storage.key_builder.build
+        return build(key, "state"), build(key, "data"), build(key, "version")
+
+    def _start_listener(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        """Drop entries changed by other replicas, reconnecting on errors."""
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATE_CHANNEL)
+                # Anything may have changed while we were not subscribed
+                self._entries.clear()
+                async for message in pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    replica_id, _, version_key = message['data'].decode().partition(' ')
+                    if replica_id != self.replica_id:
+                        self._entries.pop(version_key, None)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("FSM invalidation listener failed, reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def _remember(self, version_key: str, state, raw_data, version: int):
+        self._entries[version_key] = [state, raw_data, version, time.monotonic()]
+        self._entries.move_to_end(version_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, key: StorageKey) -> list:
+        self._start_listener()
+        state_key, data_key, version_key = self._keys(key)
+        entry = self._entries.get(version_key)
+
+        if entry is not None:
+            if time.monotonic() - entry[3] < self.trust_ttl:
+                FSM_CACHE_REQUESTS.inc(result='hit')
+                self._entries.move_to_end(version_key)
+                return entry
+            version = int(await self.redis.get(version_key) or 0)
+            if version == entry[2]:
+                FSM_CACHE_REQUESTS.inc(result='revalidated')
+                entry[3] = time.monotonic()
+                self._entries.move_to_end(version_key)
+                return entry
+
+        FSM_CACHE_REQUESTS.inc(result='miss')
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.get(version_key)
+            pipe.get(state_key)
+            pipe.get(data_key)
+            version, state, raw_data = await pipe.execute()
+        if isinstance(state, bytes):
+            state = state.decode('utf-8')
+        self._remember(version_key, state, raw_data, int(version or 0))
+        return self._entries[version_key]
+
+    async def _write(self, key: StorageKey, state_value=..., raw_data=...):
+        """Write state and/or data, bump the version and announce it in one round trip."""
+        self._start_listener()
+        state_key, data_key, version_key = self._keys(key)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if state_value is not ...:
+                if state_value is None:
+                    pipe.delete(state_key)
+                else:
+                    pipe.set(state_key, state_value, ex=self.storage.state_ttl)
+            if raw_data is not ...:
+                if raw_data is None:
+                    pipe.delete(data_key)
+                else:
+                    pipe.set(data_key, raw_data, ex=self.storage.data_ttl)
+            pipe.incr(version_key)
+            pipe.expire(version_key, self.version_ttl)
+            pipe.publish(INVALIDATE_CHANNEL, f"{self.replica_id} {version_key}")
+            version = (await pipe.execute())[-3]
+
+        entry = self._entries.get(version_key)
+        if entry is None or version != entry[2] + 1:
+            # Someone else wrote in between, our copy of the other half is stale
+            self._entries.pop(version_key, None)
+            return
+        if state_value is not ...:
+            entry[0] = state_value
+        if raw_data is not ...:
+            entry[1] = raw_data
+        entry[2] = version
+        entry[3] = time.monotonic()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._write(key, state_value=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._load(key))[0]
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise TypeError(f"Data must be a dict, got {type(data).__name__}")
+        await self._write(key, raw_data=self.storage.json_dumps(data) if data else None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        raw_data = (await self._load(key))[1]
+        if raw_data is None:
+            return {}
+        if isinstance(raw_data, bytes):
+            raw_data = raw_data.decode('utf-8')
+        # Decoded per call so callers never share mutable data
+        return self.storage.json_loads(raw_data)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        await self.storage.close()
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import re
+from aiogram import Router, types, F
+from aiogram.filters import Command, CommandObject
+from ..config import ADMIN_IDS, PROFILE_MAX_SECONDS
+from ..utils.profiling import profiler
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+# Admin only, everyone else gets no reply at all
+IS_ADMIN = F.from_user.id.in_(ADMIN_IDS)
+
+USAGE = "Usage: /debug profile <duration>, e.g. /debug profile 30s or /debug profile 2m"
+
+DURATION_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)(s|m)?$')
+
+# Telegram's message length limit
+MAX_MESSAGE_CHARS = 4096
+
+# Sessions running in the background
+profile_tasks = set()
+
+def parse_duration(text: str):
+    """Parse "30", "30s" or "2m" into seconds, None if it's invalid."""
+    match = DURATION_PATTERN.match(text.strip().lower())
+    if not match:
+        return None
+    seconds = float(match.group(1)) * (60 if match.group(2) == 'm' else 1)
+    return seconds if seconds > 0 else None
+
+async def profile_and_report(message: types.Message, seconds: float):
+    try:
+        report = await profiler.run(seconds, reason=f"/debug by {message.from_user.id}")
+    except Exception as e:
+        logger.exception("Profiling failed")
+        await message.answer(f"❌ Profiling failed: {e}")
+        return
+
+    summary = report.summary
+    if len(summary) > MAX_MESSAGE_CHARS:
+        summary = summary[:MAX_MESSAGE_CHARS - 20] + "\n… (see the files)"
+    await message.answer(summary)
+    await message.answer_document(types.FSInputFile(report.summary_path))
+    await message.answer_document(types.FSInputFile(report.profile_path))
+
+@router.message(Command("debug"), IS_ADMIN)
+async def cmd_debug(message: types.Message, command: CommandObject):
+    args = (command.args or '').split()
+    if len(args) != 2 or args[0] != 'profile':
+        await message.answer(USAGE)
+        return
+
+    seconds = parse_duration(args[1])
+    if seconds is None:
+        await message.answer(USAGE)
+        return
+    if seconds > PROFILE_MAX_SECONDS:
+        await message.answer(f"The longest profile is {PROFILE_MAX_SECONDS}s.")
+        return
+    if profiler.active:
+        await message.answer("⏳ A profiling session is already running.")
+        return
+
+    await message.answer(f"🔬 Profiling for {seconds:g}s…")
+    # Run outside the handler so the session isn't counted as handler latency
+    task = asyncio.create_task(profile_and_report(message, seconds))
+    profile_tasks.add(task)
+    task.add_done_callback(profile_tasks.discard)
+
+@router.message(Command("debug"))
+async def ignore_debug(message: types.Message):
+    """Swallow /debug from non-admins, so it doesn't reach the form handlers as an answer."""
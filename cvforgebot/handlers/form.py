@@ -1,12 +1,16 @@
+from collections import Counter
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from ..fsm.states import CVForm
-from ..keyboards.main_menu import get_form_keyboard, get_confirmation_keyboard
+from ..keyboards.main_menu import get_form_keyboard, get_confirmation_keyboard, get_edit_keyboard
 from ..models.user_data import UserCV, Education, Experience
-from ..storage.db import Database
+from ..storage.db import db
+from ..config import FORM_WRITE_MODE, FORM_CHECKPOINT_EVERY
 
 router = Router()
-db = Database()
+
+# Completed forms, used together with db.transactions to measure writes per resume
+form_stats = Counter()
 
 # Dictionary with questions for each state
 QUESTIONS = {
@@ -92,10 +96,39 @@ def get_state_name(state):
     
     return field_mapping.get(field_name, field_name)
 
+# Database field name -> CVForm state asking for it
+FIELD_STATES = {get_state_name(state): state for state in QUESTIONS}
+
+async def save_answer(message: types.Message, state: FSMContext, field: str, value: str, data: dict = None):
+    """Save a form answer according to FORM_WRITE_MODE."""
+    if FORM_WRITE_MODE != 'write_behind':
+        await db.update_user_data(message.from_user.id, field, value)
+        return
+    
+    # Keep the answer in the FSM data (Redis) and checkpoint to the DB now and then
+    if data is None:
+        data = await state.get_data()
+    answers = {**data.get('answers', {}), field: value}
+    pending = data.get('pending_answers', 0) + 1
+    if pending >= FORM_CHECKPOINT_EVERY:
+        await db.save_user_data(message.from_user.id, answers)
+        pending = 0
+    await state.update_data(answers=answers, pending_answers=pending)
+
+async def load_form_data(message: types.Message, state: FSMContext):
+    """Flush buffered answers and return the user's data from the DB."""
+    if FORM_WRITE_MODE == 'write_behind':
+        data = await state.get_data()
+        if data.get('pending_answers'):
+            await db.save_user_data(message.from_user.id, data.get('answers', {}))
+            await state.update_data(pending_answers=0)
+    form_stats['completed_forms'] += 1
+    return await db.get_user_data(message.from_user.id)
+
 @router.message(F.text == "📝 Start Filling")
 async def start_form(message: types.Message, state: FSMContext):
     # Clear old user data
-    db.clear_user_data(message.from_user.id)
+    await db.clear_user_data(message.from_user.id)
     await state.clear()
     
     await state.set_state(CVForm.full_name)
@@ -107,15 +140,66 @@ async def start_form(message: types.Message, state: FSMContext):
 @router.message(F.text == "❌ Cancel")
 async def cancel_form(message: types.Message, state: FSMContext):
     # Delete user data from DB
-    db.clear_user_data(message.from_user.id)
+    await db.clear_user_data(message.from_user.id)
     await state.clear()
     await message.answer(
         "Form filling cancelled. To start over, use the /start command",
         reply_markup=types.ReplyKeyboardRemove()
     )
 
+async def finish_edit(message: types.Message, state: FSMContext, data: dict, field: str = None, value: str = None):
+    """Leave edit mode, saving the new value if there is one, and show the summary again."""
+    update = {'editing': False}
+    if field is not None:
+        await db.update_user_data(message.from_user.id, field, value)
+        # Keep the buffered answers in line so a later flush doesn't restore the old value
+        if 'answers' in data:
+            update['answers'] = {**data['answers'], field: value}
+    await state.update_data(**update)
+    await state.set_state(None)
+    
+    if field is not None:
+        await message.answer("✅ Updated.", reply_markup=types.ReplyKeyboardRemove())
+    user_data = await db.get_user_data(message.from_user.id)
+    if not user_data:
+        # Expired by the retention job while the user was editing
+        await state.clear()
+        await message.answer(
+            "❌ Form data not found. Please fill out the form again.",
+            reply_markup=types.ReplyKeyboardRemove()
+        )
+        return
+    await show_summary(message, user_data)
+
+@router.callback_query(F.data == "edit_cv")
+async def choose_field(callback: types.CallbackQuery):
+    await callback.answer()
+    await callback.message.edit_reply_markup(reply_markup=get_edit_keyboard())
+
+@router.callback_query(F.data == "edit_done")
+async def close_edit_menu(callback: types.CallbackQuery):
+    await callback.answer()
+    await callback.message.edit_reply_markup(reply_markup=get_confirmation_keyboard())
+
+@router.callback_query(F.data.startswith("edit:"))
+async def edit_field(callback: types.CallbackQuery, state: FSMContext):
+    field_state = FIELD_STATES.get(callback.data.split(':', 1)[1])
+    if field_state is None:
+        await callback.answer()
+        return
+    
+    await callback.answer()
+    # Reuse the form state for this field, its answer goes back to the summary
+    await state.set_state(field_state)
+    await state.update_data(editing=True)
+    await callback.message.answer(QUESTIONS[field_state], reply_markup=get_form_keyboard())
+
 @router.message(F.text == "⬅️ Back")
 async def previous_step(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    if data.get('editing'):
+        await finish_edit(message, state, data)
+        return
     current_state = await state.get_state()
     if current_state in PREV_STATE:
         prev_state = PREV_STATE[current_state]
@@ -126,25 +210,35 @@ async def previous_step(message: types.Message, state: FSMContext):
 
 @router.message(F.text == "➡️ Skip")
 async def skip_step(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    if data.get('editing'):
+        # Skipping an edit keeps the current value
+        await finish_edit(message, state, data)
+        return
     current_state = await state.get_state()
     if current_state == CVForm.additional_info:
-        db.update_user_data(message.from_user.id, get_state_name(current_state), "")
-        data = db.get_user_data(message.from_user.id)
+        await save_answer(message, state, get_state_name(current_state), "", data)
+        data = await load_form_data(message, state)
         await show_summary(message, data)
     elif current_state in NEXT_STATE:
         next_state = NEXT_STATE[current_state]
         if next_state:
-            db.update_user_data(message.from_user.id, get_state_name(current_state), "Not specified")
+            await save_answer(message, state, get_state_name(current_state), "Not specified", data)
             await state.set_state(next_state)
             await message.answer(QUESTIONS[next_state], reply_markup=get_form_keyboard())
         else:
-            data = db.get_user_data(message.from_user.id)
+            data = await load_form_data(message, state)
             await show_summary(message, data)
 
 async def process_form_step(message: types.Message, state: FSMContext):
     current_state = await state.get_state()
-    # Save user's answer to DB
-    db.update_user_data(message.from_user.id, get_state_name(current_state), message.text)
+    data = await state.get_data()
+    if data.get('editing'):
+        await finish_edit(message, state, data, get_state_name(current_state), message.text)
+        return
+    
+    # Save user's answer
+    await save_answer(message, state, get_state_name(current_state), message.text, data)
     
     if current_state in NEXT_STATE:
         next_state = NEXT_STATE[current_state]
@@ -153,7 +247,7 @@ async def process_form_step(message: types.Message, state: FSMContext):
             await message.answer(QUESTIONS[next_state], reply_markup=get_form_keyboard())
         else:
             # Form completed
-            data = db.get_user_data(message.from_user.id)
+            data = await load_form_data(message, state)
             await show_summary(message, data)
 
 async def show_summary(message: types.Message, data: dict):
@@ -164,16 +258,18 @@ async def show_summary(message: types.Message, data: dict):
     summary += f"📍 Location: {data.get('location')}\n"
     summary += f"\n💼 Professional Summary:\n{data.get('professional_summary')}\n"
     summary += f"\n📚 Education:\n"
-    summary += f"- Degree: {data.get('education_degree')}\n"
-    summary += f"- Institution: {data.get('education_institution')}\n"
-    summary += f"- Year: {data.get('education_year')}\n"
-    summary += f"- Location: {data.get('education_location')}\n"
+    for education in data.get('education', []):
+        summary += f"- Degree: {education.get('degree')}\n"
+        summary += f"  Institution: {education.get('institution')}\n"
+        summary += f"  Year: {education.get('year')}\n"
+        summary += f"  Location: {education.get('location')}\n"
     summary += f"\n💡 Work Experience:\n"
-    summary += f"- Company: {data.get('experience_company')}\n"
-    summary += f"- Position: {data.get('experience_position')}\n"
-    summary += f"- Period: {data.get('experience_period')}\n"
-    summary += f"- Location: {data.get('experience_location')}\n"
-    summary += f"- Description: {data.get('experience_description')}\n"
+    for experience in data.get('experience', []):
+        summary += f"- Company: {experience.get('company')}\n"
+        summary += f"  Position: {experience.get('position')}\n"
+        summary += f"  Period: {experience.get('period')}\n"
+        summary += f"  Location: {experience.get('location')}\n"
+        summary += f"  Description: {experience.get('description')}\n"
     summary += f"\n🛠 Skills: {data.get('skills')}\n"
     summary += f"🌐 Languages: {data.get('languages')}\n"
     
@@ -1,19 +1,106 @@
+import logging
+import math
 from aiogram import Router, types, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
-from ..latex.compiler import LaTeXCompiler
+from ..config import (
+    COMPILE_BACKEND, GENERATE_USER_LIMIT, GENERATE_USER_WINDOW,
+    GENERATE_GLOBAL_LIMIT, GENERATE_GLOBAL_WINDOW, GENERATE_MAX_DELAY
+)
+from ..keyboards.main_menu import get_confirmation_keyboard, get_result_keyboard, get_template_keyboard
+from ..latex.compiler import get_compiler
+from ..latex.admission import RateLimiter, SingleFlight
+from ..latex.pool import CompilePool, QueueFullError
+from ..latex.sandbox import CompileLimitError
 from ..models.user_data import UserCV, Education, Experience
-from ..storage.db import Database
+from ..storage.db import db
+from ..storage.file_ids import create_file_id_cache, document_key
+from ..utils.metrics import (
+    DOCUMENT_SEND, DOCUMENT_SEND_FAILURES, DOCUMENT_UPLOAD_BYTES, FILE_ID_CACHE_REQUESTS,
+    COMPILES_COALESCED, GENERATE_RATE_LIMITED, GENERATE_DELAYED
+)
+
+logger = logging.getLogger(__name__)
 
 router = Router()
-latex_compiler = LaTeXCompiler()
-db = Database()
+if COMPILE_BACKEND == 'redis':
+    # Jobs are compiled by separate `cvforgebot.worker` processes
+    from ..latex.queue import RedisCompileQueue
+    compile_pool = RedisCompileQueue()
+else:
+    compile_pool = CompilePool()
+
+# At most one generation per user, plus per-user and global rate limits
+single_flight = SingleFlight()
+user_limiter = RateLimiter(GENERATE_USER_LIMIT, GENERATE_USER_WINDOW)
+global_limiter = RateLimiter(GENERATE_GLOBAL_LIMIT, GENERATE_GLOBAL_WINDOW)
+
+# Content hash -> Telegram file_id of documents already uploaded
+file_ids = create_file_id_cache()
+
+async def send_pdf(message: types.Message, pdf_bytes: bytes, filename: str, **kwargs) -> types.Message:
+    """Send a PDF, referencing the file_id of an identical earlier upload when there is one."""
+    key = document_key(pdf_bytes, filename) if file_ids is not None else None
+    file_id = await file_ids.get(key) if key else None
+    if key:
+        FILE_ID_CACHE_REQUESTS.inc(result='hit' if file_id else 'miss')
+    
+    if file_id:
+        try:
+            with DOCUMENT_SEND.time(upload='file_id'):
+                return await message.answer_document(file_id, **kwargs)
+        except TelegramBadRequest as e:
+            # The file_id is no longer valid, upload the bytes instead
+            logger.warning("Cached file_id rejected, uploading again: %s", e)
+            FILE_ID_CACHE_REQUESTS.inc(result='stale')
+            await file_ids.delete(key)
+    
+    try:
+        with DOCUMENT_SEND.time(upload='bytes'):
+            sent = await message.answer_document(types.BufferedInputFile(pdf_bytes, filename=filename), **kwargs)
+    except Exception:
+        DOCUMENT_SEND_FAILURES.inc()
+        raise
+    DOCUMENT_UPLOAD_BYTES.inc(len(pdf_bytes))
+    if key and sent.document is not None:
+        await file_ids.put(key, sent.document.file_id)
+    return sent
 
 @router.callback_query(F.data == "confirm_cv")
 async def generate_cv(callback: types.CallbackQuery, state: FSMContext):
+    user_id = callback.from_user.id
+    
+    # Repeated taps while the user's resume is being generated are turned away,
+    # the running job sends the PDF
+    if single_flight.running(user_id):
+        COMPILES_COALESCED.inc()
+        await callback.answer("⏳ Your resume is already being generated")
+        return
+    
+    if not user_limiter.try_acquire(user_id):
+        GENERATE_RATE_LIMITED.inc(scope='user')
+        retry_after = math.ceil(user_limiter.retry_after(user_id))
+        await callback.answer(f"🚦 Too many requests. Please try again in {retry_after} s.", show_alert=True)
+        return
+    
+    await single_flight.do(user_id, lambda: generate_and_send(callback, state))
+
+async def generate_and_send(callback: types.CallbackQuery, state: FSMContext):
     await callback.answer()
     
+    # Under overload wait a little for a global slot, reject beyond that
+    if global_limiter.retry_after():
+        GENERATE_DELAYED.inc()
+    if not await global_limiter.acquire(max_delay=GENERATE_MAX_DELAY):
+        GENERATE_RATE_LIMITED.inc(scope='global')
+        await callback.message.answer(
+            "🚦 Too many resumes are being generated right now.\n"
+            "Please try again in a minute."
+        )
+        return
+    
     # Get form data from database
-    data = db.get_user_data(callback.from_user.id)
+    data = await db.get_user_data(callback.from_user.id)
     
     if not data:
         await callback.message.answer(
@@ -24,33 +111,69 @@ async def generate_cv(callback: types.CallbackQuery, state: FSMContext):
     
     try:
         # Generate PDF
-        await callback.message.answer("⏳ Generating PDF resume...")
-        pdf_path = await latex_compiler.generate_pdf(data, callback.from_user.id)
+        position = await compile_pool.queue_position()
+        if position:
+            await callback.message.answer(f"⏳ You are #{position} in line. Generating PDF resume...")
+        else:
+            await callback.message.answer("⏳ Generating PDF resume...")
+        pdf_bytes = await compile_pool.submit(data, callback.from_user.id)
         
-        # Send PDF
-        with open(pdf_path, 'rb') as pdf_file:
-            await callback.message.answer_document(
-                types.FSInputFile(pdf_path, filename=f"resume_{callback.from_user.id}.pdf"),
-                caption="✅ Your resume is ready!"
-            )
+        # Send PDF straight from memory, or by file_id if it was sent before
+        await send_pdf(
+            callback.message, pdf_bytes, f"resume_{callback.from_user.id}.pdf",
+            caption="✅ Your resume is ready!",
+            reply_markup=get_result_keyboard()
+        )
         
-        # Cleanup
-        latex_compiler.cleanup(callback.from_user.id)
-        # Clear form data after successful generation
-        db.clear_user_data(callback.from_user.id)
+        # The answers are kept so single fields can still be edited and the
+        # resume regenerated. "Start Over" deletes them, and so does the
+        # retention task once they're USER_DATA_RETENTION old.
         await state.clear()
         
+    except QueueFullError:
+        await callback.message.answer(
+            "🚦 Too many resumes are being generated right now.\n"
+            "Please try again in a minute."
+        )
+    except CompileLimitError as e:
+        if e.limit in ('field_size', 'input_size'):
+            text = "Some of your answers are too long to fit on a resume. Please shorten them and try again."
+        else:
+            text = "Your resume took too long to build. Please shorten your answers and try again."
+        await callback.message.answer(f"❌ {text}")
     except Exception as e:
         await callback.message.answer(
             f"❌ An error occurred while generating PDF: {str(e)}\n"
             "Please try again or contact administrator."
         )
         
+@router.callback_query(F.data == "choose_template")
+async def choose_template(callback: types.CallbackQuery):
+    await callback.answer()
+    data = await db.get_user_data(callback.from_user.id) or {}
+    templates = get_compiler().templates.entries()
+    selected = data.get('template') or (templates[0].name if templates else None)
+    await callback.message.edit_reply_markup(reply_markup=get_template_keyboard(
+        [(template.name, template.title) for template in templates], selected
+    ))
+
+@router.callback_query(F.data.startswith("template:"))
+async def pick_template(callback: types.CallbackQuery):
+    name = callback.data.split(':', 1)[1]
+    titles = {template.name: template.title for template in get_compiler().templates.entries()}
+    if name not in titles:
+        await callback.answer("This template is no longer available", show_alert=True)
+        return
+    
+    await db.update_user_data(callback.from_user.id, 'template', name)
+    await callback.answer(f"🎨 {titles[name]} selected")
+    await callback.message.edit_reply_markup(reply_markup=get_confirmation_keyboard())
+
 @router.callback_query(F.data == "restart_cv")
 async def restart_cv(callback: types.CallbackQuery, state: FSMContext):
     await callback.answer()
     # Clear form data
-    db.clear_user_data(callback.from_user.id)
+    await db.clear_user_data(callback.from_user.id)
     await state.clear()
     await callback.message.answer(
         "🔄 Let's start over.\n"
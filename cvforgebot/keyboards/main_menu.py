@@ -20,7 +20,63 @@ def get_confirmation_keyboard() -> InlineKeyboardMarkup:
     kb = [
         [
             InlineKeyboardButton(text="✅ Generate PDF", callback_data="confirm_cv"),
+            InlineKeyboardButton(text="✏️ Edit", callback_data="edit_cv")
+        ],
+        [
+            InlineKeyboardButton(text="🎨 Template", callback_data="choose_template"),
             InlineKeyboardButton(text="🔄 Start Over", callback_data="restart_cv")
         ]
     ]
+    return InlineKeyboardMarkup(inline_keyboard=kb)
+
+def get_result_keyboard() -> InlineKeyboardMarkup:
+    kb = [
+        [
+            InlineKeyboardButton(text="✏️ Edit", callback_data="edit_cv"),
+            InlineKeyboardButton(text="🎨 Template", callback_data="choose_template")
+        ],
+        [InlineKeyboardButton(text="🔄 Start Over", callback_data="restart_cv")]
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=kb)
+
+def get_template_keyboard(templates, selected: str = None) -> InlineKeyboardMarkup:
+    """One button per (name, title) template, the selected one marked."""
+    kb = [
+        [InlineKeyboardButton(
+            text=f"✅ {title}" if name == selected else title,
+            callback_data=f"template:{name}"
+        )]
+        for name, title in templates
+    ]
+    kb.append([InlineKeyboardButton(text="⬅️ Back to summary", callback_data="edit_done")])
+    return InlineKeyboardMarkup(inline_keyboard=kb)
+
+# Button labels of the fields that can be edited from the summary
+EDIT_FIELDS = {
+    'full_name': "Full Name",
+    'email': "Email",
+    'phone': "Phone",
+    'location': "Location",
+    'professional_summary': "Summary",
+    'education_degree': "Degree",
+    'education_institution': "Institution",
+    'education_year': "Graduation Year",
+    'education_location': "Education Location",
+    'experience_company': "Company",
+    'experience_position': "Position",
+    'experience_period': "Work Period",
+    'experience_location': "Work Location",
+    'experience_description': "Responsibilities",
+    'skills': "Skills",
+    'languages': "Languages",
+    'additional_info': "Additional Info",
+}
+
+def get_edit_keyboard() -> InlineKeyboardMarkup:
+    buttons = [
+        InlineKeyboardButton(text=label, callback_data=f"edit:{field}")
+        for field, label in EDIT_FIELDS.items()
+    ]
+    kb = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+    kb.append([InlineKeyboardButton(text="⬅️ Back to summary", callback_data="edit_done")])
     return InlineKeyboardMarkup(inline_keyboard=kb) 
\ No newline at end of file
@@ -0,0 +1,73 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Set
+
+
+class SingleFlight:
+    """Keys with a job in flight, callers check `running` and turn away repeats."""
+
+    def __init__(self):
+        self._inflight: Set[Hashable] = set()
+
+    def running(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, job: Callable[[], Awaitable]):
+        """Run job() for key and return its result, the key counts as running until it ends."""
+        if key in self._inflight:
+            raise RuntimeError(f"A job for {key!r} is already running")
+        self._inflight.add(key)
+        try:
+            return await job()
+        finally:
+            self._inflight.discard(key)
+
+
+class RateLimiter:
+    """Token bucket allowing `limit` requests per `window` seconds per key."""
+
+    # Full buckets are dropped once this many keys are tracked
+    MAX_KEYS = 10000
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.rate = limit / window if window else float('inf')
+        self._buckets: Dict[Hashable, list] = {}
+
+    def _refill(self, key: Hashable, now: float) -> list:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_KEYS:
+                self._purge(now)
+            bucket = self._buckets[key] = [float(self.limit), now]
+        tokens, updated = bucket
+        bucket[0] = min(self.limit, tokens + (now - updated) * self.rate)
+        bucket[1] = now
+        return bucket
+
+    def _purge(self, now: float):
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * self.rate >= self.limit:
+                del self._buckets[key]
+
+    def retry_after(self, key: Hashable = None) -> float:
+        """Seconds until a request for key would be allowed (0 if allowed now)."""
+        tokens = self._refill(key, time.monotonic())[0]
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def try_acquire(self, key: Hashable = None) -> bool:
+        bucket = self._refill(key, time.monotonic())
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    async def acquire(self, key: Hashable = None, max_delay: float = 0) -> bool:
+        """Take a token, waiting up to max_delay seconds for one."""
+        deadline = time.monotonic() + max_delay
+        while not self.try_acquire(key):
+            wait = self.retry_after(key)
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+        return True
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import shutil
+from typing import Optional
+
+
+class PDFCache:
+    """Content-addressed on-disk store of compiled PDFs with LRU eviction.
+
+    Entries are keyed by a hash of the rendered LaTeX source, the template and
+    the TeX engine version, so identical documents are compiled only once.
+    The file mtime is used as the last-access time for eviction.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def make_key(tex_content: str, template_source: str, engine_version: str) -> str:
+        digest = hashlib.sha256()
+        for part in (tex_content, template_source, engine_version):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def _entries(self):
+        """Yield (path, mtime, size) for every cached PDF."""
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith('.pdf'):
+                stat = entry.stat()
+                yield entry.path, stat.st_mtime, stat.st_size
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the path of the cached PDF or None on a miss."""
+        path = self._path(key)
+        try:
+            # Refresh the access time for LRU ordering
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, key: str, pdf_path: str):
+        """Store a compiled PDF under the given key."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(pdf_path, tmp_path)
+        try:
+            # Overwriting an entry, its old size no longer counts
+            self._size -= os.path.getsize(path)
+        except FileNotFoundError:
+            pass
+        # Atomic rename so readers never see a half-written file
+        os.replace(tmp_path, path)
+        self._size += os.path.getsize(path)
+
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its budget."""
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self._size = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._size -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size_bytes': self._size,
+        }
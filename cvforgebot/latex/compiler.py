@@ -1,30 +1,105 @@
+import hashlib
+import logging
 import os
 import re
-import subprocess
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-from ..config import LATEX_OUTPUT_DIR, TEMPLATE_DIR
+import shutil
+import tempfile
+import time
+from collections import Counter
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+from ..config import (
+    LATEX_OUTPUT_DIR, TEMPLATE_DIR, TEMPLATE_CACHE_DIR, DEFAULT_TEMPLATE, LATEX_MAX_PASSES,
+    LATEX_BUILD_MODE, LATEX_SCRATCH_DIR, LATEX_INCREMENTAL,
+    LATEX_USE_FORMAT, LATEX_FORMAT_DIR, LATEX_PREESCAPE,
+    PDF_CACHE_ENABLED, PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES, PDF_PROFILE
+)
+from ..utils.metrics import (
+    COMPILE_STAGE, COMPILE_PASSES, COMPILE_FAILURES, COMPILES_SKIPPED, PDF_CACHE_REQUESTS
+)
+from ..utils.profiling import profiler
+from .cache import PDFCache
+from .engines import Engine
+from .fixtures import SAMPLE_CV
+from .formats import FormatBuilder, split_preamble
+from .pdf_output import PDF_PROFILES, engine_environment, postprocess_pdf
+from .sandbox import CompileLimitError, check_input, run_limited
+from .sweeper import SCRATCH_PREFIX, STATE_DIR_NAME, CACHE_DIR_NAME, KEPT_SUFFIXES, OutputSweeper
+from .templates import TemplateEntry, TemplateRegistry
+
+logger = logging.getLogger(__name__)
+
+# Single-pass translation table for special LaTeX characters
+TEX_ESCAPES = str.maketrans({
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '{': r'\{',
+    '}': r'\}',
+    '~': r'\textasciitilde{}',
+    '^': r'\^{}',
+    '\\': r'\textbackslash{}',
+    '<': r'\textless{}',
+    '>': r'\textgreater{}',
+})
 
 def escape_tex(value):
     """Escape special LaTeX characters."""
     if not isinstance(value, str):
         return value
+    return value.translate(TEX_ESCAPES)
+
+def _keep_escaped(value):
+    """|e filter used when the data was already escaped in _prepare_data."""
+    return value
+
+def _prepare_value(value, escape):
+    """Convert a data value to what the template expects.
     
-    tex_chars = {
-        '&': r'\&',
-        '%': r'\%',
-        '$': r'\$',
-        '#': r'\#',
-        '_': r'\_',
-        '{': r'\{',
-        '}': r'\}',
-        '~': r'\textasciitilde{}',
-        '^': r'\^{}',
-        '\\': r'\textbackslash{}',
-        '<': r'\textless{}',
-        '>': r'\textgreater{}',
-    }
-    pattern = '|'.join(re.escape(key) for key in tex_chars.keys())
-    return re.sub(pattern, lambda m: tex_chars[m.group()], value)
+    None becomes '', lists of plain values are joined with commas, lists of
+    dicts and dicts are prepared recursively. Strings are escaped when an
+    escape function is given.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, dict):
+        return {k: _prepare_value(v, escape) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [_prepare_value(item, escape) for item in value]
+        return _prepare_value(', '.join(str(item).strip() for item in value), escape)
+    value = str(value)
+    return escape(value) if escape else value
+
+# Log messages asking for another LaTeX run
+RERUN_PATTERN = re.compile(
+    r'Rerun to get|Label\(s\) may have changed|Please rerun LaTeX|'
+    r'Rerun LaTeX|There were undefined references'
+)
+
+# .aux commands whose values are only resolved on a later pass
+AUX_REFERENCE_PATTERN = re.compile(r'\\(newlabel|bibcite|@writefile)\b')
+
+def _observe_stage(stage: str, seconds: float):
+    """Record a compile stage in the metrics and in a running profiling session."""
+    COMPILE_STAGE.observe(seconds, stage=stage)
+    profiler.record(f"compile {stage}", seconds)
+
+def _file_hash(path):
+    """Return the sha256 of a file, or None if it doesn't exist."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def _read_text(path):
+    if not os.path.exists(path):
+        return ""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
 
 class LaTeXCompiler:
     def __init__(self):
@@ -34,18 +109,16 @@ class LaTeXCompiler:
         # Get absolute paths for templates and output
         self.template_dir = os.path.join(self.base_dir, TEMPLATE_DIR)
         self.output_dir = os.path.join(self.base_dir, LATEX_OUTPUT_DIR)
+        template_cache_dir = os.path.join(self.base_dir, TEMPLATE_CACHE_DIR)
         
         # Create directories if they don't exist
         os.makedirs(self.template_dir, exist_ok=True)
         os.makedirs(self.output_dir, exist_ok=True)
-        
-        # Print debug information
-        print(f"Template directory: {self.template_dir}")
-        print(f"Output directory: {self.output_dir}")
-        print(f"Template files: {os.listdir(self.template_dir)}")
+        os.makedirs(template_cache_dir, exist_ok=True)
         
         self.env = Environment(
             loader=FileSystemLoader(self.template_dir),
+            bytecode_cache=FileSystemBytecodeCache(template_cache_dir),
             autoescape=select_autoescape(['tex', 'latex']),
             block_start_string='{% ',  # Add space after {%
             block_end_string=' %}',    # Add space before %}
@@ -57,100 +130,372 @@ class LaTeXCompiler:
             lstrip_blocks=True
         )
         
-        # Add custom filters
-        self.env.filters['e'] = escape_tex
+        # Add custom filters. With pre-escaping the whole data tree is escaped
+        # once before rendering and |e in the template passes values through.
+        self.preescape = LATEX_PREESCAPE
+        self.env.filters['e'] = _keep_escaped if self.preescape else escape_tex
         
-        try:
-            self.template = self.env.get_template('cv_template.tex.j2')
-            print("Template loaded successfully")
-        except Exception as e:
-            print(f"Error loading template: {str(e)}")
-            raise
+        # Compression and metadata settings, rendered by partials/pdf_output.tex.j2
+        self.set_pdf_profile(PDF_PROFILE)
+        
+        self.build_mode = LATEX_BUILD_MODE
+        self.scratch_dir = LATEX_SCRATCH_DIR
+        self.incremental = LATEX_INCREMENTAL
+        # Where each user's last build and the PDF cache are kept, memory mode
+        # keeps nothing on persistent disk
+        if self.build_mode == 'memory':
+            scratch_root = self.scratch_dir or tempfile.gettempdir()
+            self.state_root = os.path.join(scratch_root, STATE_DIR_NAME)
+            cache_dir = os.path.join(scratch_root, CACHE_DIR_NAME)
+        else:
+            self.state_root = self.output_dir
+            cache_dir = os.path.join(self.base_dir, PDF_CACHE_DIR)
+        
+        self.cache = None
+        if PDF_CACHE_ENABLED:
+            self.cache = PDFCache(cache_dir, PDF_CACHE_MAX_BYTES)
+        
+        # Dumped preamble formats, one builder per engine
+        self.use_format = LATEX_USE_FORMAT
+        self.format_dir = os.path.join(self.base_dir, LATEX_FORMAT_DIR)
+        self._format_builders = {}
+        
+        # Every template in template_dir, validated and reloaded when it changes
+        self.templates = TemplateRegistry(self.env, self.template_dir, self._prepare_data, DEFAULT_TEMPLATE)
+        
+        # How many engine passes each job needed
+        self.pass_counts = Counter()
+    
+    def set_pdf_profile(self, name: str):
+        """Produce PDFs with this output profile from now on."""
+        if name not in PDF_PROFILES:
+            raise ValueError(f"Unknown PDF profile {name!r}, expected one of {', '.join(PDF_PROFILES)}")
+        self.pdf_profile = PDF_PROFILES[name]
+        self.env.globals['pdf'] = self.pdf_profile
+    
+    def _formats(self, engine: Engine) -> FormatBuilder:
+        builder = self._format_builders.get(engine.name)
+        if builder is None:
+            builder = self._format_builders[engine.name] = FormatBuilder(self.format_dir, engine.name)
+        return builder
     
     def _prepare_data(self, data: dict) -> dict:
         """Prepare data for the template."""
-        # Convert comma-separated strings to lists if they're not already lists
-        if isinstance(data.get('skills'), str):
-            data['skills'] = [s.strip() for s in data['skills'].split(',')]
-        if isinstance(data.get('languages'), str):
-            data['languages'] = [l.strip() for l in data['languages'].split(',')]
-            
-        # Ensure all dictionary values are strings or have default values
-        data = {k: str(v) if v is not None else '' for k, v in data.items()}
-        
-        # Ensure nested dictionaries exist
-        if 'education' not in data:
-            data['education'] = {}
-        if 'experience' not in data:
-            data['experience'] = {}
+        check_input(data)
+        
+        # Normalize comma-separated lists
+        data = dict(data)
+        for key in ('skills', 'languages'):
+            if isinstance(data.get(key), str):
+                data[key] = data[key].split(',')
+        
+        # Entries are lists, a single dict is one entry
+        for key in ('education', 'experience'):
+            entries = data.get(key) or []
+            data[key] = [entries] if isinstance(entries, dict) else list(entries)
+        
+        return _prepare_value(data, escape_tex if self.preescape else None)
+    
+    async def _run_engine(self, engine: Engine, user_dir: str, tex_path: str, fmt: str = None, env: dict = None):
+        """Run a single engine pass under the sandbox limits."""
+        return await run_limited(*engine.command(tex_path, user_dir, fmt), cwd=user_dir, env=env)
+    
+    def _needs_rerun(self, user_dir: str, aux_before) -> bool:
+        """Check the log and .aux of the last pass for rerun conditions."""
+        if RERUN_PATTERN.search(_read_text(os.path.join(user_dir, 'resume.log'))):
+            return True
+        
+        # Changed cross-reference data in the .aux also needs another pass
+        aux_path = os.path.join(user_dir, 'resume.aux')
+        if _file_hash(aux_path) != aux_before:
+            return bool(AUX_REFERENCE_PATTERN.search(_read_text(aux_path)))
+        return False
+    
+    async def _get_format(self, template: TemplateEntry, tex_content: str):
+        """Return the dumped format for this document's preamble, if enabled."""
+        if not self.use_format or not template.engine.supports_format:
+            return None
+        preamble, _ = split_preamble(tex_content)
+        if preamble is None:
+            return None
+        engine_version = await template.engine.version()
+        return await self._formats(template.engine).get_format(template.name, preamble, engine_version)
+    
+    async def warm_up(self):
+        """Load and validate every template and build their preamble formats
+        before the first user job needs them."""
+        for template in self.templates.entries():
+            await self._get_format(template, template.render(self._prepare_data(dict(SAMPLE_CV))))
+    
+    async def _compile(self, engine: Engine, user_dir: str, tex_path: str, tex_content: str, fmt: str = None,
+                       timings: dict = None, env: dict = None) -> int:
+        """Write the LaTeX file and compile it, returning the number of passes.
+        
+        Per-pass durations are added to timings when it's given, env is the
+        engine's environment.
+        """
+        timings = {} if timings is None else timings
+        
+        # With a format the preamble is already loaded, only the body is compiled
+        if fmt:
+            _, tex_content = split_preamble(tex_content)
+        
+        # Write LaTeX file
+        with open(tex_path, 'w', encoding='utf-8') as f:
+            f.write(tex_content)
+        
+        # Compile LaTeX to PDF, rerunning only while the log or .aux asks for it
+        aux_path = os.path.join(user_dir, 'resume.aux')
+        passes = 0
+        while True:
+            aux_before = _file_hash(aux_path)
+            start = time.perf_counter()
+            returncode, stdout, stderr = await self._run_engine(engine, user_dir, tex_path, fmt, env)
+            passes += 1
+            elapsed = time.perf_counter() - start
+            timings[f'pass{passes}'] = elapsed
+            _observe_stage(f'{engine.name}_pass_{passes}', elapsed)
+            COMPILE_PASSES.inc()
             
-        # Ensure all nested dictionary values are strings
-        for key in ['education', 'experience']:
-            if isinstance(data[key], dict):
-                data[key] = {k: str(v) if v is not None else '' for k, v in data[key].items()}
+            if returncode != 0:
+                error_log = _read_text(os.path.join(user_dir, 'resume.log'))
+                logger.error(
+                    "LaTeX compilation failed pass=%d returncode=%s\nSTDOUT:\n%s\nSTDERR:\n%s\nLOG:\n%s",
+                    passes, returncode, stdout, stderr, error_log
+                )
+                raise Exception(f"LaTeX compilation failed:\nSTDERR: {stderr}\nLOG: {error_log}")
             
-        return data
+            # tectonic already reran itself until the document was stable
+            if engine.reruns_itself or passes >= LATEX_MAX_PASSES \
+                    or not self._needs_rerun(user_dir, aux_before):
+                return passes
     
-    async def generate_pdf(self, data: dict, user_id: int) -> str:
-        """Generate PDF from the template using the provided data."""
-        data = self._prepare_data(data)
+    @staticmethod
+    def _previous_build(state_dir: str, key: str):
+        """Return the PDF of the user's last build if it was built from the same document."""
+        pdf_path = os.path.join(state_dir, 'resume.pdf')
+        if _read_text(os.path.join(state_dir, 'resume.hash')) == key and os.path.exists(pdf_path):
+            return pdf_path
+        return None
+    
+    @staticmethod
+    def _forget_build(state_dir: str, aux: bool = False):
+        """Invalidate the saved build, and drop its .aux when it may be broken."""
+        names = ('resume.hash', 'resume.aux') if aux else ('resume.hash',)
+        for name in names:
+            try:
+                os.remove(os.path.join(state_dir, name))
+            except FileNotFoundError:
+                pass
+    
+    @staticmethod
+    def _save_build(build_dir: str, state_dir: str, key: str):
+        """Keep the .aux and PDF of a successful build for the user's next job."""
+        os.makedirs(state_dir, exist_ok=True)
+        if build_dir != state_dir:
+            for name in ('resume.aux', 'resume.pdf'):
+                source = os.path.join(build_dir, name)
+                if os.path.exists(source):
+                    tmp_path = os.path.join(state_dir, f"{name}.tmp")
+                    shutil.copyfile(source, tmp_path)
+                    os.replace(tmp_path, os.path.join(state_dir, name))
+        # Written last, it's what marks the saved build as complete
+        tmp_path = os.path.join(state_dir, 'resume.hash.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(key)
+        os.replace(tmp_path, os.path.join(state_dir, 'resume.hash'))
+    
+    async def _generate_in(self, build_dir: str, data: dict, user_id: int, state_dir: str = None,
+                           template: TemplateEntry = None) -> str:
+        """Render and compile the resume inside build_dir, returning the PDF path.
         
-        # Create user directory with absolute path
-        user_dir = os.path.join(self.output_dir, str(user_id))
-        os.makedirs(user_dir, exist_ok=True)
+        The template is the one named by data['template'], or the default.
+        On a cache hit the path of the cached PDF is returned instead. With a
+        state_dir the user's previous build is reused: an unchanged document
+        returns the previous PDF, otherwise the previous .aux seeds the build
+        so the cross-references are already resolved after one pass.
+        """
+        job_start = time.perf_counter()
+        timings = {}
         
         # Generate LaTeX file
-        tex_path = os.path.join(user_dir, 'resume.tex')
-        pdf_path = os.path.join(user_dir, 'resume.pdf')
+        tex_path = os.path.join(build_dir, 'resume.tex')
+        pdf_path = os.path.join(build_dir, 'resume.pdf')
         
         try:
-            # Render template
-            tex_content = self.template.render(**data)
+            # The job keeps this version of the template even if it's reloaded meanwhile
+            if template is None:
+                template = self.templates.get(data.get('template'))
+            engine = template.engine
             
-            # Write LaTeX file
-            with open(tex_path, 'w', encoding='utf-8') as f:
-                f.write(tex_content)
+            # Render template, the profile is part of the rendered preamble and so of the cache key
+            pdf_profile = self.pdf_profile
+            start = time.perf_counter()
+            tex_content = template.render(self._prepare_data(data))
+            timings['render'] = time.perf_counter() - start
+            _observe_stage('render', timings['render'])
             
-            print(f"Generated LaTeX file at: {tex_path}")
+            cache_key = None
+            if self.cache is not None or state_dir is not None:
+                engine_version = await engine.version()
+                cache_key = PDFCache.make_key(tex_content, template.hash, engine_version)
             
-            # Compile LaTeX to PDF
-            for i in range(2):
-                process = subprocess.run(
-                    ['pdflatex', '-interaction=nonstopmode', '-output-directory', user_dir, tex_path],
-                    cwd=user_dir,
-                    capture_output=True,
-                    text=True
-                )
-                
-                if process.returncode != 0:
-                    error_log = ""
-                    log_file = os.path.join(user_dir, 'resume.log')
-                    if os.path.exists(log_file):
-                        with open(log_file, 'r', encoding='utf-8') as f:
-                            error_log = f.read()
-                    
-                    print(f"LaTeX compilation failed (attempt {i+1}):")
-                    print(f"Return code: {process.returncode}")
-                    print(f"STDOUT:\n{process.stdout}")
-                    print(f"STDERR:\n{process.stderr}")
-                    print(f"LOG:\n{error_log}")
-                    
-                    raise Exception(f"LaTeX compilation failed:\nSTDERR: {process.stderr}\nLOG: {error_log}")
+            # Nothing changed since this user's last build
+            if state_dir is not None:
+                previous_path = self._previous_build(state_dir, cache_key)
+                if previous_path:
+                    COMPILES_SKIPPED.inc()
+                    self._log_job(user_id, job_start, timings, passes=0, cache='unchanged')
+                    return previous_path
+                self._forget_build(state_dir)
+                if state_dir != build_dir and os.path.exists(os.path.join(state_dir, 'resume.aux')):
+                    shutil.copyfile(os.path.join(state_dir, 'resume.aux'), os.path.join(build_dir, 'resume.aux'))
+            
+            # Identical documents are served straight from the cache
+            if self.cache is not None:
+                cached_path = self.cache.get(cache_key)
+                PDF_CACHE_REQUESTS.inc(result='hit' if cached_path else 'miss')
+                if cached_path:
+                    self._log_job(user_id, job_start, timings, passes=0, cache='hit')
+                    return cached_path
+            
+            # Start from the precompiled preamble when one is available
+            env = engine_environment(pdf_profile)
+            start = time.perf_counter()
+            fmt = await self._get_format(template, tex_content)
+            timings['format'] = time.perf_counter() - start
+            _observe_stage('format', timings['format'])
+            try:
+                passes = await self._compile(engine, build_dir, tex_path, tex_content, fmt, timings, env)
+            except CompileLimitError:
+                raise
+            except Exception:
+                if fmt is None:
+                    raise
+                logger.warning("Compilation with precompiled format %s failed, retrying without it", fmt)
+                COMPILE_FAILURES.inc(reason='format')
+                self._formats(engine).mark_failed(os.path.basename(fmt))
+                passes = await self._compile(engine, build_dir, tex_path, tex_content, None, timings, env)
+            
+            self.pass_counts[passes] += 1
             
             if not os.path.exists(pdf_path):
                 raise Exception("PDF file was not created")
             
-            print(f"Generated PDF file at: {pdf_path}")
+            await postprocess_pdf(pdf_profile, pdf_path, timings)
+            if 'postprocess' in timings:
+                _observe_stage('postprocess', timings['postprocess'])
+            
+            if self.cache is not None:
+                self.cache.put(cache_key, pdf_path)
+            if state_dir is not None:
+                self._save_build(build_dir, state_dir, cache_key)
+            
+            self._log_job(user_id, job_start, timings, passes=passes, cache='miss' if self.cache is not None else 'off')
             return pdf_path
             
+        except CompileLimitError:
+            COMPILE_FAILURES.inc(reason='limit')
+            raise
         except Exception as e:
-            print(f"Error during PDF generation: {str(e)}")
+            if state_dir is not None:
+                # A failed pass can leave a broken .aux behind
+                self._forget_build(state_dir, aux=True)
+            COMPILE_FAILURES.inc(reason='error')
+            logger.error("PDF generation failed user=%s error=%s", user_id, e)
             raise Exception(f"Failed to generate PDF: {str(e)}")
+    
+    @staticmethod
+    def _log_job(user_id: int, job_start: float, timings: dict, passes: int, cache: str):
+        """Write one structured log line with the job's stage timings."""
+        total = time.perf_counter() - job_start
+        _observe_stage('total', total)
+        stages = ' '.join(f"{stage}_ms={seconds * 1000:.1f}" for stage, seconds in timings.items())
+        logger.info(
+            "compile finished user=%s passes=%d cache=%s %s total_ms=%.1f",
+            user_id, passes, cache, stages, total * 1000
+        )
+    
+    async def generate_pdf(self, data: dict, user_id: int) -> str:
+        """Generate PDF from the template using the provided data."""
+        # Create user directory with absolute path
+        user_dir = os.path.join(self.output_dir, str(user_id))
+        os.makedirs(user_dir, exist_ok=True)
         
+        pdf_path = os.path.join(user_dir, 'resume.pdf')
+        state_dir = user_dir if self.incremental else None
+        result_path = await self._generate_in(user_dir, data, user_id, state_dir)
+        if result_path != pdf_path:
+            shutil.copyfile(result_path, pdf_path)
+        return pdf_path
+    
+    async def build_pdf(self, data: dict, user_id: int) -> bytes:
+        """Generate the resume and return the PDF bytes.
+        
+        In memory mode every job gets its own scratch directory, so nothing is
+        written to persistent disk and parallel jobs of one user can't collide.
+        The incremental build state and the PDF cache are kept in the scratch
+        directory too.
+        """
+        if self.build_mode != 'memory':
+            try:
+                pdf_path = await self.generate_pdf(data, user_id)
+                with open(pdf_path, 'rb') as f:
+                    return f.read()
+            finally:
+                # Failed builds are cleaned up too
+                self.cleanup(user_id)
+        
+        # The user's previous build is kept in the scratch directory for incremental rebuilds
+        state_dir = os.path.join(self.state_root, str(user_id)) if self.incremental else None
+        job_dir = tempfile.mkdtemp(prefix=f"{SCRATCH_PREFIX}{user_id}-", dir=self.scratch_dir)
+        try:
+            pdf_path = await self._generate_in(job_dir, data, user_id, state_dir)
+            with open(pdf_path, 'rb') as f:
+                return f.read()
+        finally:
+            self._remove_dir(job_dir)
+    
+    @staticmethod
+    def _remove_dir(path: str):
+        """Remove a build directory, detaching it with an atomic rename first."""
+        trash_path = f"{path}.trash"
+        try:
+            os.rename(path, trash_path)
+        except OSError:
+            trash_path = path
+        shutil.rmtree(trash_path, ignore_errors=True)
+    
     def cleanup(self, user_id: int):
-        """Clean up temporary files."""
+        """Clean up temporary files, keeping the PDF and the incremental build state."""
+        kept = KEPT_SUFFIXES if self.incremental else ('.pdf',)
         user_dir = os.path.join(self.output_dir, str(user_id))
         if os.path.exists(user_dir):
             for file in os.listdir(user_dir):
-                if not file.endswith('.pdf'):
-                    os.remove(os.path.join(user_dir, file)) 
\ No newline at end of file
+                if not file.endswith(kept):
+                    try:
+                        os.remove(os.path.join(user_dir, file))
+                    except FileNotFoundError:
+                        pass
+    
+    def create_sweeper(self) -> OutputSweeper:
+        """Return a sweeper for this compiler's output, scratch and cache directories."""
+        return OutputSweeper(
+            self.output_dir, self.scratch_dir,
+            cache_dir=self.cache.cache_dir if self.cache is not None else None,
+            state_dir=self.state_root if self.state_root != self.output_dir else None
+        )
+
+
+_compiler = None
+
+def get_compiler() -> LaTeXCompiler:
+    """Return the shared compiler, creating it on first use."""
+    global _compiler
+    if _compiler is None:
+        _compiler = LaTeXCompiler()
+    return _compiler
+
+async def warm_up_compiler():
+    """Create the shared compiler and build its preamble format."""
+    await get_compiler().warm_up()
@@ -0,0 +1,236 @@
+"""TeX engines the compiler can run, and the choice between them.
+
+pdflatex is the fastest and supports precompiled preamble formats, but only
+handles Cyrillic when the T2A fonts are installed. xelatex and lualatex read
+UTF-8 natively and use system fonts through fontspec. tectonic is a
+self-contained XeTeX that reruns itself until the document is stable.
+
+The engine used for a template is picked by LATEX_ENGINE:
+- an engine name, or a comma-separated list in order of preference
+- "auto": the ranking written by the benchmark below for this template, or
+  DEFAULT_ORDER when the template hasn't been benchmarked
+
+Engines that aren't installed are skipped, falling back to the next one.
+
+Benchmark every installed engine on every template and save the ranking
+(from the repository root):
+    python -m cvforgebot.latex.engines --runs 5 --save
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+from ..config import LATEX_ENGINE, LATEX_ENGINE_RANKING
+
+logger = logging.getLogger(__name__)
+
+# Log lines of glyphs the selected fonts don't have, the text is silently dropped
+MISSING_GLYPH_PATTERN = re.compile(r'Missing character: There is no')
+
+
+class Engine:
+    """How to run one TeX engine.
+
+    `supports_format` engines can load a dumped preamble format,
+    `reruns_itself` engines need a single invocation per document.
+    """
+    name = ''
+    binary = ''
+    supports_format = False
+    reruns_itself = False
+
+    def __init__(self):
+        self._version = None
+
+    def available(self) -> bool:
+        return shutil.which(self.binary) is not None
+
+    def command(self, tex_path: str, output_dir: str, fmt: str = None) -> List[str]:
+        """Arguments of one pass compiling tex_path into output_dir."""
+        args = [self.binary, '-interaction=nonstopmode', '-output-directory', output_dir]
+        if fmt:
+            args.append(f'-fmt={fmt}')
+        return args + [tex_path]
+
+    async def version(self) -> str:
+        """Return the engine's version banner (cached after the first call)."""
+        if self._version is None:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    self.binary, '--version',
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL
+                )
+                stdout, _ = await process.communicate()
+                lines = stdout.decode('utf-8', errors='replace').splitlines()
+                self._version = lines[0] if lines else ''
+            except FileNotFoundError:
+                self._version = ''
+        return self._version
+
+
+class PdfLaTeX(Engine):
+    name = binary = 'pdflatex'
+    supports_format = True
+
+
+class XeLaTeX(Engine):
+    # Fonts loaded through fontspec can't be dumped into a format
+    name = binary = 'xelatex'
+
+
+class LuaLaTeX(Engine):
+    name = binary = 'lualatex'
+
+
+class Tectonic(Engine):
+    name = binary = 'tectonic'
+    reruns_itself = True
+
+    def command(self, tex_path: str, output_dir: str, fmt: str = None) -> List[str]:
+        # --untrusted disables shell escape and other insecure features
+        return [
+            self.binary, '--untrusted', '--keep-logs', '--keep-intermediates',
+            '--chatter', 'minimal', '--outdir', output_dir, tex_path
+        ]
+
+
+ENGINES: Dict[str, Engine] = {engine.name: engine for engine in (PdfLaTeX(), XeLaTeX(), LuaLaTeX(), Tectonic())}
+
+# Preference without benchmark results, fastest first
+DEFAULT_ORDER = ('pdflatex', 'xelatex', 'lualatex', 'tectonic')
+
+
+def load_ranking(path: str = LATEX_ENGINE_RANKING) -> Dict[str, List[str]]:
+    """Return the saved benchmark ranking, template name -> engine names."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable engine ranking %s: %s", path, e)
+        return {}
+
+
+def candidates(template_name: str, setting: str = LATEX_ENGINE) -> List[str]:
+    """Engine names to try for a template, in order of preference."""
+    if setting == 'auto':
+        return load_ranking().get(template_name) or list(DEFAULT_ORDER)
+    return [name.strip() for name in setting.split(',') if name.strip()]
+
+
+def select_engine(template_name: str, setting: str = LATEX_ENGINE) -> Engine:
+    """Return the first installed engine of the candidates for this template."""
+    names = candidates(template_name, setting)
+    for name in names:
+        engine = ENGINES.get(name)
+        if engine is None:
+            logger.warning("Unknown TeX engine %r in LATEX_ENGINE", name)
+            continue
+        if engine.available():
+            if name != names[0]:
+                logger.warning("TeX engine %s is not installed, using %s for %s", names[0], name, template_name)
+            return engine
+    # Nothing usable is installed, compiles report the missing binary
+    logger.error("None of the TeX engines %s is installed", ', '.join(names))
+    return ENGINES.get(names[0], ENGINES[DEFAULT_ORDER[0]])
+
+
+async def _build(compiler, template, data: dict):
+    """Compile one fixture, returning (seconds, why the output is wrong or None)."""
+    job_dir = tempfile.mkdtemp(prefix='cvforge-engine-')
+    try:
+        start = time.perf_counter()
+        await compiler._generate_in(job_dir, data, 0, template=template)
+        elapsed = time.perf_counter() - start
+        log_path = os.path.join(job_dir, 'resume.log')
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            if MISSING_GLYPH_PATTERN.search(f.read()):
+                return elapsed, "missing glyphs in the output"
+        return elapsed, None
+    except Exception as e:
+        return None, str(e).splitlines()[0]
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+
+async def benchmark(runs: int) -> Dict[str, List[dict]]:
+    """Time every installed engine on every template, results sorted fastest first."""
+    from .compiler import LaTeXCompiler
+    from .fixtures import FIXTURES, SAMPLE_CV
+    from .templates import TemplateEntry
+
+    compiler = LaTeXCompiler()
+    # Measure compilation itself, not cache hits
+    compiler.cache = None
+
+    results = {}
+    for loaded in compiler.templates.entries():
+        rows = []
+        for engine in ENGINES.values():
+            if not engine.available():
+                rows.append({'engine': engine.name, 'error': 'not installed'})
+                continue
+            template = TemplateEntry(loaded.name, loaded.title, loaded.template, loaded.hash, loaded.mtime, engine)
+            await compiler._get_format(template, template.render(compiler._prepare_data(SAMPLE_CV)))
+
+            # The first build of every fixture checks it, the following ones are timed
+            errors = []
+            for fixture_name, data in FIXTURES.items():
+                _, error = await _build(compiler, template, data)
+                if error:
+                    errors.append(f"{fixture_name}: {error}")
+            if errors:
+                rows.append({'engine': engine.name, 'error': '; '.join(errors)})
+                continue
+
+            timings = []
+            for _ in range(runs):
+                for data in FIXTURES.values():
+                    elapsed, _ = await _build(compiler, template, data)
+                    if elapsed is not None:
+                        timings.append(elapsed)
+            if timings:
+                rows.append({'engine': engine.name, 'median_ms': statistics.median(timings) * 1000})
+            else:
+                rows.append({'engine': engine.name, 'error': 'every timed build failed'})
+
+        rows.sort(key=lambda row: row.get('median_ms', float('inf')))
+        results[loaded.name] = rows
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the installed TeX engines on every template")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--save', action='store_true', help=f"write the ranking to {LATEX_ENGINE_RANKING}")
+    args = parser.parse_args()
+
+    results = await benchmark(args.runs)
+    ranking = {}
+    for template_name, rows in results.items():
+        print(template_name)
+        for row in rows:
+            if 'error' in row:
+                print(f"  {row['engine']:<10} failed: {row['error']}")
+            else:
+                print(f"  {row['engine']:<10} median={row['median_ms']:.1f}ms")
+        ranking[template_name] = [row['engine'] for row in rows if 'error' not in row]
+
+    if args.save:
+        with open(LATEX_ENGINE_RANKING, 'w', encoding='utf-8') as f:
+            json.dump(ranking, f, indent=2)
+        print(f"ranking saved to {LATEX_ENGINE_RANKING}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+# Sample CV data in the shape returned by Database.get_user_data.
+# Used to warm up and validate templates and by the benchmarks.
+
+SAMPLE_CV = {
+    'full_name': 'Jane Doe',
+    'email': 'jane.doe@example.com',
+    'phone': '+1 555 123 4567',
+    'location': 'Berlin, Germany',
+    'professional_summary': (
+        'Backend engineer with 6 years of experience building high-load web services. '
+        'Focused on Python, distributed systems & observability.'
+    ),
+    'education': [
+        {
+            'degree': 'MSc Computer Science',
+            'institution': 'Technical University of Munich',
+            'year': '2018',
+            'location': 'Munich, Germany'
+        },
+        {
+            'degree': 'BSc Computer Science',
+            'institution': 'University of Stuttgart',
+            'year': '2016',
+            'location': 'Stuttgart, Germany'
+        },
+    ],
+    'experience': [
+        {
+            'company': 'Acme Corp',
+            'position': 'Senior Software Engineer',
+            'period': '2019-2024',
+            'location': 'Berlin, Germany',
+            'description': (
+                'Designed the payments API (99.99% uptime), cut p95 latency by 40% '
+                'and mentored a team of 4 engineers.'
+            )
+        },
+        {
+            'company': 'Initech',
+            'position': 'Software Engineer',
+            'period': '2016-2019',
+            'location': 'Stuttgart, Germany',
+            'description': 'Built the internal billing service & its reporting pipeline.'
+        },
+    ],
+    'skills': 'Python, PostgreSQL, Redis, Docker, Kubernetes',
+    'languages': 'English - C1, German - B2',
+    'additional_info': 'AWS Certified Solutions Architect'
+}
+
+# The same resume in Russian, checks that an engine renders Cyrillic
+SAMPLE_CV_RU = {
+    'full_name': 'Анна Иванова',
+    'email': 'anna.ivanova@example.com',
+    'phone': '+7 912 345 67 89',
+    'location': 'Москва, Россия',
+    'professional_summary': (
+        'Backend-разработчик с 6 годами опыта создания высоконагруженных веб-сервисов. '
+        'Python, распределённые системы и наблюдаемость.'
+    ),
+    'education': [
+        {
+            'degree': 'Магистр прикладной математики',
+            'institution': 'МГУ им. М. В. Ломоносова',
+            'year': '2018',
+            'location': 'Москва, Россия'
+        },
+    ],
+    'experience': [
+        {
+            'company': 'ООО «Ромашка»',
+            'position': 'Ведущий разработчик',
+            'period': '2019–2024',
+            'location': 'Москва, Россия',
+            'description': 'Спроектировала платёжный API (99,99% доступности) и сократила p95 задержки на 40%.'
+        },
+    ],
+    'skills': 'Python, PostgreSQL, Redis, Docker',
+    'languages': 'Русский — родной, English — C1',
+    'additional_info': ''
+}
+
+# Fixtures every template has to render correctly
+FIXTURES = {
+    'english': SAMPLE_CV,
+    'russian': SAMPLE_CV_RU,
+}
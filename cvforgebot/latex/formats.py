@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+from typing import Optional
+
+from .sandbox import CompileLimitError, run_limited
+
+logger = logging.getLogger(__name__)
+
+BEGIN_DOCUMENT = '\\begin{document}'
+
+
+def split_preamble(tex_content: str):
+    """Split a LaTeX document into (preamble, body) at \\begin{document}."""
+    index = tex_content.find(BEGIN_DOCUMENT)
+    if index == -1:
+        return None, tex_content
+    return tex_content[:index], tex_content[index:]
+
+
+class FormatBuilder:
+    """Builds dumped .fmt files from template preambles via mylatexformat.
+
+    A format is keyed by the engine, the preamble text, the engine version and
+    the mtime of the engine binary, so it's rebuilt automatically when the
+    template or the TeX installation changes. Stale formats of the same
+    template and engine are removed, other engines' formats are left alone.
+    """
+
+    def __init__(self, format_dir: str, engine: str = 'pdflatex'):
+        self.format_dir = format_dir
+        self.engine = engine
+        self._failed = set()
+        self._locks = {}
+
+        os.makedirs(self.format_dir, exist_ok=True)
+
+    def _installation_stamp(self) -> str:
+        binary = shutil.which(self.engine)
+        if not binary:
+            return ''
+        return f"{os.path.realpath(binary)}:{os.stat(binary).st_mtime}"
+
+    def format_name(self, template_name: str, preamble: str, engine_version: str) -> str:
+        digest = hashlib.sha256()
+        for part in (self.engine, preamble, engine_version, self._installation_stamp()):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return f"{self._prefix(template_name)}{digest.hexdigest()[:16]}"
+
+    def _prefix(self, template_name: str) -> str:
+        """Start of the names of this template's formats for this engine."""
+        return f"{template_name.split('.')[0]}-{self.engine}-"
+
+    def mark_failed(self, name: str):
+        """Stop using a format that produced a broken compile."""
+        self._failed.add(name)
+
+    async def get_format(self, template_name: str, preamble: str, engine_version: str) -> Optional[str]:
+        """Return the format path (without .fmt) for this preamble, building it if needed."""
+        name = self.format_name(template_name, preamble, engine_version)
+        fmt_base = os.path.join(self.format_dir, name)
+        if name in self._failed:
+            return None
+        if os.path.exists(f"{fmt_base}.fmt"):
+            return fmt_base
+
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if os.path.exists(f"{fmt_base}.fmt"):
+                return fmt_base
+            if not await self._build(name, preamble):
+                self._failed.add(name)
+                return None
+
+        self._remove_stale(template_name, name)
+        return fmt_base
+
+    async def _build(self, name: str, preamble: str) -> bool:
+        source_path = os.path.join(self.format_dir, f"{name}.tex")
+        with open(source_path, 'w', encoding='utf-8') as f:
+            f.write(preamble)
+            f.write(f"{BEGIN_DOCUMENT}\n\\end{{document}}\n")
+
+        try:
+            returncode, _, _ = await run_limited(
+                self.engine, '-ini', '-interaction=nonstopmode',
+                f'-jobname={name}', f'-output-directory={self.format_dir}',
+                f'&{self.engine}', 'mylatexformat.ltx', source_path,
+                cwd=self.format_dir
+            )
+        except (FileNotFoundError, CompileLimitError):
+            return False
+
+        ok = returncode == 0 and os.path.exists(os.path.join(self.format_dir, f"{name}.fmt"))
+        if ok:
+            logger.info("Built LaTeX format %s", name)
+        else:
+            logger.warning("Failed to build LaTeX format %s", name)
+        return ok
+
+    def _remove_stale(self, template_name: str, current: str):
+        """Delete formats built by this engine from older versions of the same template."""
+        prefix = self._prefix(template_name)
+        for file in os.listdir(self.format_dir):
+            if file.startswith(prefix) and not file.startswith(current):
+                try:
+                    os.remove(os.path.join(self.format_dir, file))
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,128 @@
+"""PDF output profiles: how compact the generated PDFs are.
+
+A profile is rendered into the template preamble (partials/pdf_output.tex.j2)
+as the engine's compression and metadata settings, and can name a tool that
+rewrites the finished PDF:
+- qpdf: lossless, packs objects into compressed object streams
+- ghostscript: re-distills the PDF with subsetted and compressed fonts
+
+TeX engines already subset Type 1 and OpenType fonts, the ghostscript step
+also subsets fonts that were embedded in full. A missing tool is skipped,
+and the original PDF is kept if the rewritten one isn't smaller.
+"""
+import logging
+import os
+import shutil
+import time
+from typing import Optional
+
+from ..config import PDF_POSTPROCESS_TIMEOUT
+from ..utils.metrics import PDF_OUTPUT_BYTES, PDF_POSTPROCESS_SAVED_BYTES
+from .sandbox import CompileLimitError, run_limited
+
+logger = logging.getLogger(__name__)
+
+
+class PdfProfile:
+    """Output settings, `None` keeps the engine's default for that setting.
+
+    compress_level: stream compression, 0-9
+    object_compress_level: 0 writes plain objects, 1-3 packs them into
+        compressed object streams (needs PDF 1.5)
+    metadata: set title, author and subject in the document info
+    deterministic: leave out trailer IDs and engine info and pin the creation
+        date (SOURCE_DATE_EPOCH), so the same document always gives the same
+        bytes. Not for ghostscript, which writes fresh dates and IDs itself
+    postprocess: None, "qpdf" or "ghostscript"
+    """
+
+    def __init__(self, name: str, compress_level: int = None, object_compress_level: int = None,
+                 metadata: bool = True, deterministic: bool = False, postprocess: str = None):
+        self.name = name
+        self.compress_level = compress_level
+        self.object_compress_level = object_compress_level
+        self.metadata = metadata
+        self.deterministic = deterministic
+        self.postprocess = postprocess
+
+
+PDF_PROFILES = {profile.name: profile for profile in (
+    # What the engine produces by default
+    PdfProfile('standard'),
+    PdfProfile('small', compress_level=9, object_compress_level=2, deterministic=True),
+    PdfProfile('smallest', compress_level=9, object_compress_level=3, deterministic=True,
+               postprocess='qpdf'),
+    # ghostscript stamps its own dates and document ID, the output differs on every run
+    PdfProfile('distilled', compress_level=9, object_compress_level=2, postprocess='ghostscript'),
+)}
+
+
+def engine_environment(profile: PdfProfile) -> Optional[dict]:
+    """Environment for the engine runs of a profile, None inherits this process's one."""
+    if not profile.deterministic:
+        return None
+    # xdvipdfmx only knows dates, so this is what makes xelatex and tectonic output reproducible
+    return {**os.environ, 'SOURCE_DATE_EPOCH': '0', 'FORCE_SOURCE_DATE': '1'}
+
+
+def _postprocess_command(tool: str, source: str, target: str) -> list:
+    if tool == 'qpdf':
+        return [
+            'qpdf', '--object-streams=generate', '--compress-streams=y', '--recompress-flate',
+            '--compression-level=9', '--remove-unreferenced-resources=yes', '--deterministic-id',
+            source, target
+        ]
+    if tool == 'ghostscript':
+        return [
+            'gs', '-q', '-dBATCH', '-dNOPAUSE', '-dSAFER', '-sDEVICE=pdfwrite',
+            '-dPDFSETTINGS=/prepress', '-dSubsetFonts=true', '-dEmbedAllFonts=true',
+            '-dCompressFonts=true', '-dDetectDuplicateImages=true',
+            f'-sOutputFile={target}', source
+        ]
+    raise ValueError(f"Unknown PDF post-processor: {tool}")
+
+
+# Tools found missing, not tried again
+_missing_tools = set()
+
+
+async def postprocess_pdf(profile: PdfProfile, pdf_path: str, timings: dict = None):
+    """Rewrite the PDF in place with the profile's post-processor, if it has one."""
+    PDF_OUTPUT_BYTES.observe(os.path.getsize(pdf_path), profile=profile.name, stage='engine')
+    if profile.postprocess is None or profile.postprocess in _missing_tools:
+        return
+
+    start = time.perf_counter()
+    build_dir = os.path.dirname(pdf_path)
+    target = os.path.join(build_dir, 'resume.post.pdf')
+    command = _postprocess_command(profile.postprocess, pdf_path, target)
+    try:
+        returncode, _, stderr = await run_limited(*command, cwd=build_dir, timeout=PDF_POSTPROCESS_TIMEOUT)
+    except FileNotFoundError:
+        _missing_tools.add(profile.postprocess)
+        logger.warning("%s is not installed, PDFs are sent without post-processing", command[0])
+        return
+    except CompileLimitError as e:
+        logger.warning("PDF post-processing stopped, sending the unprocessed PDF: %s", e)
+        return
+    finally:
+        if timings is not None:
+            timings['postprocess'] = time.perf_counter() - start
+
+    # qpdf exits with 3 when it succeeded with warnings
+    if returncode not in (0, 3) or not os.path.exists(target):
+        logger.warning("%s failed with %s, sending the unprocessed PDF: %s", command[0], returncode, stderr.strip())
+        return
+
+    before, after = os.path.getsize(pdf_path), os.path.getsize(target)
+    if after < before:
+        os.replace(target, pdf_path)
+        PDF_POSTPROCESS_SAVED_BYTES.inc(before - after, tool=profile.postprocess)
+    else:
+        os.remove(target)
+    PDF_OUTPUT_BYTES.observe(min(before, after), profile=profile.name, stage='postprocess')
+
+
+def available_postprocessors() -> dict:
+    """Post-processor name -> whether its tool is installed."""
+    return {'qpdf': shutil.which('qpdf') is not None, 'ghostscript': shutil.which('gs') is not None}
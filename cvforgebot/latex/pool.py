@@ -0,0 +1,74 @@
+import asyncio
+import time
+from ..config import COMPILE_CONCURRENCY, COMPILE_QUEUE_SIZE
+from ..utils.metrics import COMPILE_QUEUE_WAIT, COMPILE_REJECTED
+from .compiler import get_compiler
+
+
+class QueueFullError(Exception):
+    """Raised when the compile queue has no free slots left."""
+
+
+class CompilePool:
+    """Limits how many LaTeX compilations run at the same time.
+
+    Jobs above the concurrency limit wait in a bounded FIFO queue. When the
+    queue is full new jobs are rejected with QueueFullError instead of piling up.
+    """
+
+    def __init__(self, compiler=None, concurrency: int = COMPILE_CONCURRENCY, queue_size: int = COMPILE_QUEUE_SIZE):
+        self._compiler = compiler
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(0, queue_size)
+        self._semaphore = None
+        self._running = 0
+        self._waiting = 0
+
+    @property
+    def compiler(self):
+        # Fall back to the shared compiler, created on first use
+        if self._compiler is None:
+            self._compiler = get_compiler()
+        return self._compiler
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def position(self) -> int:
+        """Return the place a new job would take in line (0 if it starts right away)."""
+        if self._running < self.concurrency and self._waiting == 0:
+            return 0
+        return self._waiting + 1
+
+    async def queue_position(self) -> int:
+        return self.position()
+
+    async def submit(self, data: dict, user_id: int) -> bytes:
+        """Wait for a free slot and compile the resume, returning the PDF bytes."""
+        # Created lazily so the semaphore is bound to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        if self.position() and self._waiting >= self.queue_size:
+            COMPILE_REJECTED.inc()
+            raise QueueFullError("Compile queue is full")
+
+        self._waiting += 1
+        start = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        COMPILE_QUEUE_WAIT.observe(time.perf_counter() - start)
+
+        self._running += 1
+        try:
+            return await self.compiler.build_pdf(data, user_id)
+        finally:
+            self._running -= 1
+            self._semaphore.release()
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Optional
+
+import redis.asyncio as redis
+
+from ..config import (
+    REDIS_DSN, COMPILE_QUEUE_SIZE, COMPILE_JOB_TIMEOUT, COMPILE_JOB_RETRIES,
+    COMPILE_RESULT_TIMEOUT, WORKER_HEARTBEAT_INTERVAL
+)
+from ..utils.metrics import COMPILE_QUEUE_WAIT, COMPILE_REJECTED, COMPILE_FAILURES, COMPILE_JOBS_EXPIRED
+from .pool import QueueFullError
+from .sandbox import CompileLimitError
+
+logger = logging.getLogger(__name__)
+
+# Redis keys
+QUEUE_KEY = "cvforge:compile:queue"
+PROCESSING_PREFIX = "cvforge:compile:processing:"
+HEARTBEAT_PREFIX = "cvforge:compile:worker:"
+RESULT_PREFIX = "cvforge:compile:result:"
+DONE_PREFIX = "cvforge:compile:done:"
+
+# Finished results are kept this long for the bot to pick them up
+RESULT_TTL = 600
+
+
+class RedisCompileQueue:
+    """Bot-side client that sends compile jobs to workers over Redis.
+
+    Jobs are pushed onto a list, a worker acks them when done and pushes the
+    status to a per-job list the bot blocks on. The PDF bytes are stored under
+    a separate key with a TTL. Every job carries the time the bot stops
+    waiting for it, workers drop jobs past that deadline.
+    """
+
+    def __init__(self, dsn: str = REDIS_DSN, queue_size: int = COMPILE_QUEUE_SIZE):
+        self.redis = redis.Redis.from_url(dsn)
+        self.queue_size = queue_size
+
+    async def queue_position(self) -> int:
+        """Return the place a new job would take in line (0 if nothing is queued)."""
+        waiting = await self.redis.llen(QUEUE_KEY)
+        return waiting + 1 if waiting else 0
+
+    async def submit(self, data: dict, user_id: int) -> bytes:
+        """Enqueue a job and wait for its result, returning the PDF bytes."""
+        if await self.redis.llen(QUEUE_KEY) >= self.queue_size:
+            COMPILE_REJECTED.inc()
+            raise QueueFullError("Compile queue is full")
+
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'user_id': user_id,
+            'data': data,
+            'attempts': 0,
+            'enqueued_at': time.time(),
+            'deadline': time.time() + COMPILE_RESULT_TIMEOUT,
+        }
+        await self.redis.lpush(QUEUE_KEY, json.dumps(job))
+
+        result = await self.redis.blpop(DONE_PREFIX + job_id, timeout=COMPILE_RESULT_TIMEOUT)
+        if result is None:
+            raise TimeoutError("Compile job timed out")
+
+        status = json.loads(result[1])
+        if not status['ok']:
+            if status.get('limit'):
+                raise CompileLimitError(status['limit'], status['error'])
+            raise Exception(status['error'])
+        pdf_bytes = await self.redis.getdel(RESULT_PREFIX + job_id)
+        if pdf_bytes is None:
+            raise Exception("Compile result expired")
+        return pdf_bytes
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+class CompileWorker:
+    """Consumes compile jobs from Redis and runs them through LaTeXCompiler.
+
+    Every worker moves jobs into its own processing list and keeps a heartbeat
+    key alive. Jobs left in the processing list of a worker whose heartbeat
+    expired are put back on the queue by any other worker. A job is removed
+    from the processing list in the same transaction that stores its result
+    or requeues it for a retry, so a crash in between can't lose or double it.
+    """
+
+    def __init__(self, compiler, dsn: str = REDIS_DSN, concurrency: int = 1,
+                 job_timeout: int = COMPILE_JOB_TIMEOUT, retries: int = COMPILE_JOB_RETRIES):
+        self.compiler = compiler
+        self.redis = redis.Redis.from_url(dsn)
+        self.concurrency = max(1, concurrency)
+        self.job_timeout = job_timeout
+        self.retries = retries
+        # The pid alone repeats when a container restarts, the old processing
+        # list must stay orphaned until its heartbeat expires
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.processing_key = PROCESSING_PREFIX + self.worker_id
+        self.heartbeat_key = HEARTBEAT_PREFIX + self.worker_id
+        self._stopping = asyncio.Event()
+
+    async def run(self):
+        logger.info("Compile worker %s started with %d slot(s)", self.worker_id, self.concurrency)
+        await self._heartbeat()
+        await self.recover_orphaned_jobs()
+        tasks = [asyncio.create_task(self._heartbeat_loop())]
+        tasks += [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+        try:
+            await self._stopping.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Hand unfinished jobs back to the queue
+            await self._requeue_all(self.processing_key)
+            await self.redis.delete(self.heartbeat_key)
+            await self.redis.aclose()
+            logger.info("Compile worker %s stopped", self.worker_id)
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _heartbeat(self):
+        await self.redis.set(self.heartbeat_key, int(time.time()), ex=WORKER_HEARTBEAT_INTERVAL * 3)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+            await self._heartbeat()
+            await self.recover_orphaned_jobs()
+
+    async def recover_orphaned_jobs(self):
+        """Requeue jobs held by workers whose heartbeat has expired."""
+        async for key in self.redis.scan_iter(match=PROCESSING_PREFIX + '*'):
+            worker_id = key.decode()[len(PROCESSING_PREFIX):]
+            if not await self.redis.exists(HEARTBEAT_PREFIX + worker_id):
+                moved = await self._requeue_all(key)
+                if moved:
+                    logger.warning("Requeued %d job(s) of dead worker %s", moved, worker_id)
+
+    async def _requeue_all(self, key) -> int:
+        moved = 0
+        while await self.redis.lmove(key, QUEUE_KEY, 'RIGHT', 'RIGHT') is not None:
+            moved += 1
+        return moved
+
+    async def _consume(self):
+        while True:
+            raw_job = await self.redis.blmove(QUEUE_KEY, self.processing_key, timeout=5, src='RIGHT', dest='LEFT')
+            if raw_job is None:
+                continue
+            try:
+                await self._process(raw_job)
+            except asyncio.CancelledError:
+                # Not acked, run() hands it back to the queue on shutdown
+                raise
+            except Exception:
+                logger.exception("Failed to handle compile job")
+                # Broken job, retrying it wouldn't help
+                await self._ack(raw_job)
+
+    async def _ack(self, raw_job: bytes):
+        await self.redis.lrem(self.processing_key, 1, raw_job)
+
+    @staticmethod
+    def _expired(job: dict) -> bool:
+        """Whether the bot has given up on the job, nobody would read its result."""
+        # Jobs queued before deadlines were added have none
+        return time.time() > job.get('deadline', float('inf'))
+
+    async def _process(self, raw_job: bytes):
+        job = json.loads(raw_job)
+        COMPILE_QUEUE_WAIT.observe(max(0.0, time.time() - job['enqueued_at']))
+        if self._expired(job):
+            COMPILE_JOBS_EXPIRED.inc()
+            logger.warning("Dropping job %s, the bot stopped waiting for it", job['id'])
+            await self._ack(raw_job)
+            return
+        try:
+            pdf_bytes = await asyncio.wait_for(
+                self.compiler.build_pdf(job['data'], job['user_id']),
+                timeout=self.job_timeout
+            )
+        except CompileLimitError as e:
+            # Same input, same limit: not worth a retry
+            await self._finish(raw_job, job['id'], None, str(e), limit=e.limit)
+            return
+        except Exception as e:
+            reason = 'timeout' if isinstance(e, asyncio.TimeoutError) else 'error'
+            error = "Compilation timed out" if reason == 'timeout' else str(e)
+            job['attempts'] += 1
+            if job['attempts'] <= self.retries and not self._expired(job):
+                logger.warning("Job %s failed (%s), retry %d", job['id'], error, job['attempts'])
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    pipe.lrem(self.processing_key, 1, raw_job)
+                    pipe.lpush(QUEUE_KEY, json.dumps(job))
+                    await pipe.execute()
+                return
+            COMPILE_FAILURES.inc(reason=reason)
+            await self._finish(raw_job, job['id'], None, error)
+            return
+
+        if self._expired(job):
+            # Finished too late, don't leave the PDF behind for RESULT_TTL
+            COMPILE_JOBS_EXPIRED.inc()
+            logger.warning("Job %s finished after the bot stopped waiting for it", job['id'])
+            await self._ack(raw_job)
+            return
+        await self._finish(raw_job, job['id'], pdf_bytes, None)
+
+    async def _finish(self, raw_job: bytes, job_id: str, pdf_bytes: Optional[bytes], error: Optional[str],
+                      limit: Optional[str] = None):
+        """Publish the job's result and ack it."""
+        done_key = DONE_PREFIX + job_id
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.processing_key, 1, raw_job)
+            if pdf_bytes is not None:
+                pipe.set(RESULT_PREFIX + job_id, pdf_bytes, ex=RESULT_TTL)
+            pipe.lpush(done_key, json.dumps({'ok': error is None, 'error': error, 'limit': limit}))
+            pipe.expire(done_key, RESULT_TTL)
+            await pipe.execute()
@@ -0,0 +1,195 @@
+import asyncio
+import errno
+import logging
+import os
+import shutil
+import signal
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows, limits are skipped there
+    resource = None
+
+from ..config import (
+    LATEX_PASS_TIMEOUT, LATEX_CPU_LIMIT, LATEX_MEMORY_LIMIT, LATEX_OUTPUT_LIMIT,
+    LATEX_MAX_FIELD_CHARS, LATEX_MAX_INPUT_CHARS
+)
+from ..utils.metrics import COMPILE_LIMIT_VIOLATIONS
+
+logger = logging.getLogger(__name__)
+
+# util-linux prlimit sets the limits and then execs the command
+PRLIMIT = shutil.which('prlimit')
+# Otherwise resource.prlimit() sets them from this process after the start, Linux only
+HAS_PRLIMIT = hasattr(resource, 'prlimit')
+
+if not PRLIMIT and not HAS_PRLIMIT:
+    logger.warning("Neither prlimit nor resource.prlimit is available, TeX runs without CPU, memory and file size limits")
+
+MB = 1024 * 1024
+
+# Messages printed by TeX/kpathsea when an allocation fails
+MEMORY_ERRORS = ('memory exhausted', 'TeX capacity exceeded')
+
+
+class CompileLimitError(Exception):
+    """A compile job hit one of the input or resource limits.
+
+    `limit` names the limit: input_size, field_size, timeout, cpu, memory
+    or output_size. Retrying such a job gives the same result. `killed` is
+    used for engines killed by something else, most likely the OOM killer.
+    """
+
+    def __init__(self, limit: str, message: str):
+        super().__init__(message)
+        self.limit = limit
+
+    def __reduce__(self):
+        # Keeps the limit when the error crosses a process boundary
+        return self.__class__, (self.limit, str(self))
+
+
+def _violation(limit: str, message: str) -> CompileLimitError:
+    COMPILE_LIMIT_VIOLATIONS.inc(limit=limit)
+    logger.warning("Compile limit exceeded limit=%s %s", limit, message)
+    return CompileLimitError(limit, message)
+
+
+def _text_values(value, path=''):
+    """Yield (field path, text) for every string in the data tree."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _text_values(item, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, (list, tuple)):
+        for index, item in enumerate(value):
+            yield from _text_values(item, f"{path}[{index}]")
+    elif value is not None:
+        yield path, str(value)
+
+
+def check_input(data: dict, max_field: int = LATEX_MAX_FIELD_CHARS, max_total: int = LATEX_MAX_INPUT_CHARS):
+    """Reject form data too large to render, before any work is done."""
+    total = 0
+    for field, text in _text_values(data):
+        if len(text) > max_field:
+            raise _violation('field_size', f"Field {field} is {len(text)} characters long, the limit is {max_field}")
+        total += len(text)
+    if total > max_total:
+        raise _violation('input_size', f"Form data is {total} characters long, the limit is {max_total}")
+
+
+def _limited_command(args) -> list:
+    """Prefix the command with prlimit, which applies the limits before exec.
+
+    Limits are never set with preexec_fn, it isn't safe while other threads
+    run (the aiosqlite connection, the default executor) and can deadlock
+    the child between fork and exec.
+    """
+    # prlimit would exit with 127, callers expect the missing binary as FileNotFoundError
+    if shutil.which(args[0]) is None:
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), args[0])
+    return [
+        PRLIMIT,
+        # SIGXCPU at the soft limit, SIGKILL a second later
+        f'--cpu={LATEX_CPU_LIMIT}:{LATEX_CPU_LIMIT + 1}',
+        f'--as={LATEX_MEMORY_LIMIT * MB}',
+        # SIGXFSZ when any written file grows past the limit
+        f'--fsize={LATEX_OUTPUT_LIMIT * MB}',
+        '--core=0',
+        '--', *args
+    ]
+
+
+def _set_limits(pid: int):
+    """Limit a started child from this process, when prlimit isn't installed.
+
+    The CPU limit counts the time already used, the others apply to
+    allocations and writes from here on.
+    """
+    try:
+        # SIGXCPU at the soft limit, SIGKILL a second later
+        resource.prlimit(pid, resource.RLIMIT_CPU, (LATEX_CPU_LIMIT, LATEX_CPU_LIMIT + 1))
+        resource.prlimit(pid, resource.RLIMIT_AS, (LATEX_MEMORY_LIMIT * MB, LATEX_MEMORY_LIMIT * MB))
+        # SIGXFSZ when any written file grows past the limit
+        resource.prlimit(pid, resource.RLIMIT_FSIZE, (LATEX_OUTPUT_LIMIT * MB, LATEX_OUTPUT_LIMIT * MB))
+        resource.prlimit(pid, resource.RLIMIT_CORE, (0, 0))
+    except ProcessLookupError:
+        # Already exited
+        pass
+
+
+def _children_cpu_time() -> float:
+    """CPU seconds used by all reaped children of this process."""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _hit_cpu_limit(elapsed: float, children_cpu: float) -> bool:
+    """Whether a SIGKILLed engine can have reached the CPU hard limit.
+
+    TeX is single threaded, so it can't use more CPU time than wall time.
+    The children's CPU time also counts other compiles that ended meanwhile,
+    it only rules the limit out when even that stays below it.
+    """
+    if elapsed < LATEX_CPU_LIMIT:
+        return False
+    return resource is None or children_cpu >= LATEX_CPU_LIMIT
+
+
+def _kill_group(process):
+    if process.returncode is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def run_limited(*args: str, cwd: str, timeout: float = LATEX_PASS_TIMEOUT, env: dict = None):
+    """Run a TeX command under the resource limits, returning (returncode, stdout, stderr).
+
+    The command gets its own process group, so on timeout or cancellation
+    everything it spawned is killed along with it. Without `env` it inherits
+    this process's environment.
+    """
+    command = _limited_command(args) if PRLIMIT else args
+    start, children_cpu = time.monotonic(), _children_cpu_time()
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        cwd=cwd,
+        env=env,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True
+    )
+    if not PRLIMIT and HAS_PRLIMIT:
+        _set_limits(process.pid)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        _kill_group(process)
+        await process.wait()
+        raise _violation('timeout', f"{args[0]} ran longer than {timeout} seconds")
+    except asyncio.CancelledError:
+        # Don't leave the engine running when the job is cancelled
+        _kill_group(process)
+        await process.wait()
+        raise
+
+    stdout = stdout.decode('utf-8', errors='replace')
+    stderr = stderr.decode('utf-8', errors='replace')
+    returncode = process.returncode
+    if returncode == -signal.SIGKILL and not _hit_cpu_limit(
+            time.monotonic() - start, _children_cpu_time() - children_cpu):
+        raise _violation('killed', f"{args[0]} was killed, most likely out of memory")
+    if returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+        raise _violation('cpu', f"{args[0]} used more than {LATEX_CPU_LIMIT} seconds of CPU time")
+    if returncode == -signal.SIGXFSZ:
+        raise _violation('output_size', f"{args[0]} wrote a file larger than {LATEX_OUTPUT_LIMIT} MB")
+    if returncode != 0 and any(error in stdout or error in stderr for error in MEMORY_ERRORS):
+        raise _violation('memory', f"{args[0]} ran out of memory")
+    return returncode, stdout, stderr
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Optional
+
+from ..config import OUTPUT_TTL, OUTPUT_MAX_BYTES, OUTPUT_SWEEP_INTERVAL, OUTPUT_LEFTOVER_AGE
+from ..utils.metrics import OUTPUT_RECLAIMED_BYTES, OUTPUT_REMOVED_ENTRIES, OUTPUT_SWEEP_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the per-job scratch directories created by LaTeXCompiler.build_pdf.
+# Specific to jobs, the scratch directory may be the system temp directory
+# shared with other cvforge-* directories, e.g. the benchmarks'.
+SCRATCH_PREFIX = "cvforge-job-"
+
+# Per-user incremental build state and the PDF cache in the scratch directory,
+# used in memory build mode
+STATE_DIR_NAME = "cvforge-state"
+CACHE_DIR_NAME = "cvforge-cache"
+
+# Files in per-user directories that are results or build state for the next job,
+# anything else there is a leftover of a failed build
+KEPT_SUFFIXES = ('.pdf', '.aux', '.hash')
+
+
+def _tree_usage(path: str):
+    """Return (bytes, newest file mtime) of a file or directory tree.
+
+    The mtime of a directory itself only counts when it holds no files,
+    removing leftovers from it must not make it look recently used.
+    """
+    try:
+        stat = os.lstat(path)
+    except FileNotFoundError:
+        return 0, 0.0
+    if not os.path.isdir(path):
+        return stat.st_size, stat.st_mtime
+    size, newest = 0, None
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.lstat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            size += stat.st_size
+            newest = stat.st_mtime if newest is None else max(newest, stat.st_mtime)
+    return size, os.lstat(path).st_mtime if newest is None else newest
+
+
+class OutputSweeper:
+    """Keeps output/ and the scratch directory from growing without bound.
+
+    Per-user directories in output/ and in `state_dir` untouched for `ttl`
+    seconds are removed, and when the total of either exceeds `max_bytes`
+    the least recently used ones go first. Build files and scratch directories older than `leftover_age`
+    belong to jobs that failed or crashed and are removed too. Directories
+    changed within `leftover_age` are never touched, a job may be using them.
+    """
+
+    def __init__(self, output_dir: str, scratch_dir: Optional[str] = None, cache_dir: Optional[str] = None,
+                 state_dir: Optional[str] = None, ttl: float = OUTPUT_TTL, max_bytes: int = OUTPUT_MAX_BYTES,
+                 interval: float = OUTPUT_SWEEP_INTERVAL, leftover_age: float = OUTPUT_LEFTOVER_AGE):
+        self.output_dir = output_dir
+        self.scratch_dir = scratch_dir or tempfile.gettempdir()
+        self.cache_dir = cache_dir
+        self.state_dir = state_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.leftover_age = leftover_age
+
+    def _remove(self, path: str, size: int, reason: str):
+        """Remove a file or tree, detaching directories with an atomic rename first."""
+        try:
+            if os.path.isdir(path) and not os.path.islink(path):
+                trash_path = path if path.endswith('.trash') else f"{path}.trash"
+                if trash_path != path:
+                    os.rename(path, trash_path)
+                shutil.rmtree(trash_path, ignore_errors=True)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning("Could not remove %s: %s", path, e)
+            return
+        OUTPUT_REMOVED_ENTRIES.inc(reason=reason)
+        OUTPUT_RECLAIMED_BYTES.inc(size, reason=reason)
+
+    def _user_roots(self):
+        """Directories holding one subdirectory per user."""
+        roots = [self.output_dir]
+        if self.state_dir and os.path.isdir(self.state_dir):
+            roots.append(self.state_dir)
+        return roots
+
+    def recover(self) -> int:
+        """Remove what crashed or failed jobs left behind, returning the bytes freed."""
+        cutoff = time.time() - self.leftover_age
+        freed = 0
+
+        def listing(directory: Optional[str], match):
+            if not directory or not os.path.isdir(directory):
+                return []
+            return [entry.path for entry in os.scandir(directory) if match(entry.name)]
+
+        candidates = (
+            # Job directories and their half-deleted .trash copies
+            listing(self.scratch_dir, lambda name: name.startswith(SCRATCH_PREFIX))
+            + [path for root in self._user_roots() for path in listing(root, lambda name: name.endswith('.trash'))]
+            # Interrupted PDF cache writes
+            + listing(self.cache_dir, lambda name: name.endswith('.tmp'))
+        )
+        for path in candidates:
+            size, mtime = _tree_usage(path)
+            # Half-deleted trees can go right away, the rest only once abandoned
+            if path.endswith('.trash') or mtime < cutoff:
+                self._remove(path, size, 'leftover')
+                freed += size
+
+        # Build files of failed jobs next to the kept PDFs
+        for root in self._user_roots():
+            for entry in os.scandir(root):
+                if not entry.is_dir() or entry.name.endswith('.trash'):
+                    continue
+                for file in os.scandir(entry.path):
+                    if file.name.endswith(KEPT_SUFFIXES) or not file.is_file():
+                        continue
+                    stat = file.stat()
+                    if stat.st_mtime < cutoff:
+                        self._remove(file.path, stat.st_size, 'leftover')
+                        freed += stat.st_size
+        return freed
+
+    def _sweep_root(self, root: str, now: float):
+        """Apply the TTL and the quota to the user directories in root, returning (freed, kept) bytes."""
+        entries = []
+        for entry in os.scandir(root):
+            if entry.is_dir() and not entry.name.endswith('.trash'):
+                size, mtime = _tree_usage(entry.path)
+                entries.append((mtime, size, entry.path))
+        entries.sort()
+
+        freed = 0
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            age = now - mtime
+            if age > self.ttl:
+                reason = 'ttl'
+            elif total > self.max_bytes and age > self.leftover_age:
+                reason = 'quota'
+            else:
+                continue
+            self._remove(path, size, reason)
+            total -= size
+            freed += size
+        if total > self.max_bytes:
+            logger.warning("%s holds %d bytes, over the %d byte quota", root, total, self.max_bytes)
+        return freed, total
+
+    def sweep(self) -> int:
+        """Apply the TTL and the quota to output/ and the state directory, returning the bytes freed."""
+        start = time.perf_counter()
+        freed = self.recover()
+        now = time.time()
+
+        total = 0
+        for root in self._user_roots():
+            root_freed, root_total = self._sweep_root(root, now)
+            freed += root_freed
+            total += root_total
+
+        elapsed = time.perf_counter() - start
+        OUTPUT_SWEEP_DURATION.observe(elapsed)
+        if freed:
+            logger.info("output sweep freed_bytes=%d kept_bytes=%d duration_ms=%.1f", freed, total, elapsed * 1000)
+        return freed
+
+    async def run(self):
+        """Sweep every `interval` seconds in a thread, until cancelled."""
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception:
+                logger.exception("Output sweep failed")
+            await asyncio.sleep(self.interval)
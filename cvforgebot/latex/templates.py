@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+from jinja2 import Environment, Template
+
+from ..config import TEMPLATE_RELOAD_INTERVAL
+from ..utils.metrics import TEMPLATE_RELOADS
+from .engines import Engine, select_engine
+from .fixtures import FIXTURES
+from .formats import BEGIN_DOCUMENT
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_SUFFIX = '.tex.j2'
+
+# Optional first line of a template naming it in the template keyboard
+TITLE_PATTERN = re.compile(r'\A\{#\s*title:\s*(.+?)\s*#\}')
+
+
+class TemplateError(Exception):
+    """A template failed to load or to render the fixtures."""
+
+
+class TemplateEntry:
+    """A loaded and validated template with the engine selected for it.
+
+    Entries are never modified, a reload replaces the entry, so jobs that
+    already picked one finish with the version they started with.
+    """
+
+    def __init__(self, name: str, title: str, template: Template, source_hash: str, mtime: float, engine: Engine):
+        self.name = name
+        self.title = title
+        self.template = template
+        self.hash = source_hash
+        self.mtime = mtime
+        self.engine = engine
+
+    def render(self, data: dict) -> str:
+        return self.template.render(engine=self.engine.name, **data)
+
+
+class TemplateRegistry:
+    """Every *.tex.j2 template in the template directory, reloaded when its file changes.
+
+    At most every `reload_interval` seconds a lookup checks the directory for
+    new, changed and removed templates. A changed template replaces the loaded
+    one only if it renders all fixtures, otherwise the last good version stays.
+
+    Files in subdirectories (partials/) are only included by templates. Jinja
+    loads included files at render time, so a changed partial takes effect in
+    every template at once: all of them are validated again, and the ones it
+    breaks are dropped.
+    """
+
+    def __init__(self, env: Environment, template_dir: str, prepare, default: str,
+                 reload_interval: float = TEMPLATE_RELOAD_INTERVAL):
+        self.env = env
+        self.template_dir = template_dir
+        # Turns form data into template variables, the compiler's _prepare_data
+        self.prepare = prepare
+        self.default = default
+        self.reload_interval = reload_interval
+        self._entries: Dict[str, TemplateEntry] = {}
+        # name -> (mtime, partials) of versions that failed validation, not retried until a file changes again
+        self._rejected: Dict[str, tuple] = {}
+        # (relative path, mtime) of every partial when the templates were last validated
+        self._partials: tuple = ()
+        self._checked_at = None
+
+    def _discover(self) -> Dict[str, float]:
+        """Return name -> mtime of the template files."""
+        found = {}
+        for file in os.listdir(self.template_dir):
+            if file.endswith(TEMPLATE_SUFFIX):
+                try:
+                    found[file] = os.stat(os.path.join(self.template_dir, file)).st_mtime
+                except FileNotFoundError:
+                    pass
+        return found
+
+    def _discover_partials(self) -> tuple:
+        """Return (relative path, mtime) of every file in the subdirectories, sorted."""
+        found = []
+        for root, _, files in os.walk(self.template_dir):
+            if root == self.template_dir:
+                continue
+            for file in files:
+                path = os.path.join(root, file)
+                try:
+                    found.append((os.path.relpath(path, self.template_dir), os.stat(path).st_mtime))
+                except FileNotFoundError:
+                    pass
+        return tuple(sorted(found))
+
+    def _load(self, name: str, mtime: float) -> TemplateEntry:
+        """Compile a template and render every fixture with it."""
+        try:
+            source = self.env.loader.get_source(self.env, name)[0]
+            template = self.env.get_template(name)
+        except Exception as e:
+            raise TemplateError(f"{name} doesn't compile: {e}") from e
+
+        # The hash covers the partials too, they're part of what the template renders
+        digest = hashlib.sha256(source.encode('utf-8'))
+        for path, _ in self._partials:
+            try:
+                with open(os.path.join(self.template_dir, path), 'rb') as f:
+                    digest.update(f.read())
+            except FileNotFoundError:
+                pass
+
+        match = TITLE_PATTERN.match(source)
+        title = match.group(1) if match else name[:-len(TEMPLATE_SUFFIX)].replace('_', ' ').title()
+        entry = TemplateEntry(name, title, template, digest.hexdigest(), mtime, select_engine(name))
+        for fixture_name, data in FIXTURES.items():
+            try:
+                tex_content = entry.render(self.prepare(data))
+            except Exception as e:
+                raise TemplateError(f"{name} fails to render the {fixture_name} fixture: {e}") from e
+            if BEGIN_DOCUMENT not in tex_content or '\\end{document}' not in tex_content:
+                raise TemplateError(f"{name} doesn't render a complete document for the {fixture_name} fixture")
+        return entry
+
+    def refresh(self):
+        """Load new and changed templates and drop removed ones."""
+        self._checked_at = time.monotonic()
+        found = self._discover()
+        partials = self._discover_partials()
+        partials_changed = partials != self._partials
+        if partials_changed and self._partials:
+            logger.info("Template partials changed, validating every template again")
+        self._partials = partials
+
+        for name in list(self._entries):
+            if name not in found:
+                logger.warning("Template %s was removed", name)
+                del self._entries[name]
+
+        for name, mtime in found.items():
+            current = self._entries.get(name)
+            if current is not None and current.mtime == mtime and not partials_changed:
+                continue
+            if self._rejected.get(name) == (mtime, partials):
+                continue
+            try:
+                entry = self._load(name, mtime)
+            except TemplateError as e:
+                self._rejected[name] = (mtime, partials)
+                TEMPLATE_RELOADS.inc(result='invalid')
+                if current is not None and current.mtime == mtime:
+                    # Only a partial changed, the loaded version would render it too
+                    del self._entries[name]
+                    logger.error("%s, it's no longer offered until it's fixed", e)
+                elif current is not None:
+                    logger.error("%s, keeping the loaded version", e)
+                else:
+                    logger.error("%s, it won't be offered", e)
+                continue
+            self._rejected.pop(name, None)
+            self._entries[name] = entry
+            if current is not None:
+                TEMPLATE_RELOADS.inc(result='reloaded')
+                logger.info("Reloaded template %s", name)
+            else:
+                TEMPLATE_RELOADS.inc(result='loaded')
+                logger.info("Loaded template %s (%s, %s)", name, entry.title, entry.engine.name)
+
+    def _maybe_refresh(self):
+        if self._checked_at is None:
+            self.refresh()
+        elif self.reload_interval and time.monotonic() - self._checked_at >= self.reload_interval:
+            self.refresh()
+
+    def entries(self) -> List[TemplateEntry]:
+        """Return the usable templates, the default first."""
+        self._maybe_refresh()
+        return sorted(self._entries.values(), key=lambda entry: (entry.name != self.default, entry.title))
+
+    def get(self, name: Optional[str] = None) -> TemplateEntry:
+        """Return the template to render, the default one for an unknown or missing name."""
+        self._maybe_refresh()
+        entry = self._entries.get(name) or self._entries.get(self.default)
+        if entry is None:
+            # The default template itself is broken, any valid one is better than none
+            entry = next(iter(self._entries.values()), None)
+        if entry is None:
+            raise TemplateError("No valid template is available")
+        return entry
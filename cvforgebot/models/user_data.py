@@ -5,11 +5,13 @@ class Education(BaseModel):
     degree: str
     institution: str
     year: str
+    location: Optional[str] = None
 
 class Experience(BaseModel):
     company: str
     position: str
     period: str
+    location: Optional[str] = None
     description: str
 
 class UserCV(BaseModel):
@@ -22,11 +24,11 @@ class UserCV(BaseModel):
     # Professional Summary
     professional_summary: str
     
-    # Education
-    education: Education
+    # Education, any number of entries
+    education: List[Education] = []
     
-    # Work Experience
-    experience: Experience
+    # Work Experience, any number of entries
+    experience: List[Experience] = []
     
     # Skills and Languages
     skills: List[str]
@@ -1,109 +1,394 @@
-import sqlite3
+import asyncio
+import functools
 import json
-from pathlib import Path
-from typing import Dict, Optional
+import logging
+import time
+import aiosqlite
+from typing import Dict, List, Optional
+from ..config import DB_PATH, DB_LAYOUT, USER_DATA_RETENTION, USER_DATA_RETENTION_INTERVAL
+from ..utils.metrics import DB_OPERATION, USER_DATA_EXPIRED
+
+logger = logging.getLogger(__name__)
+
+def _timed(func):
+    """Record the latency of a database method."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with DB_OPERATION.time(op=func.__name__):
+            return await func(*args, **kwargs)
+    return wrapper
+
+# Top-level CV fields stored in user_data
+PROFILE_FIELDS = (
+    'full_name', 'email', 'phone', 'location', 'professional_summary',
+    'skills', 'languages', 'additional_info'
+)
+
+# Per-user settings stored in user_data next to the CV
+SETTING_FIELDS = ('template',)
+
+# Child tables with any number of entries per user, and their columns
+ENTRY_FIELDS = {
+    'education': ('degree', 'institution', 'year', 'location'),
+    'experience': ('company', 'position', 'period', 'location', 'description'),
+}
+
+# Form field name -> (child table or None, column). The form fills entry 0.
+FIELD_COLUMNS = {field: (None, field) for field in PROFILE_FIELDS + SETTING_FIELDS}
+FIELD_COLUMNS.update(
+    (f"{table}_{column}", (table, column))
+    for table, columns in ENTRY_FIELDS.items() for column in columns
+)
+
+def _entry_select(table: str) -> str:
+    """Subquery returning a user's entries of table as one JSON array."""
+    columns = ENTRY_FIELDS[table]
+    pairs = ', '.join(f"'{column}', {column}" for column in columns)
+    return (
+        f"(SELECT json_group_array(json_object({pairs})) FROM "
+        f"(SELECT * FROM {table} WHERE user_id = u.user_id ORDER BY entry_no)) AS {table}"
+    )
+
+def _entry_table(table: str) -> str:
+    columns = ', '.join(f'{column} TEXT' for column in ENTRY_FIELDS[table])
+    return (
+        f'CREATE TABLE {table} ('
+        f'user_id INTEGER NOT NULL REFERENCES user_data(user_id) ON DELETE CASCADE, '
+        f'entry_no INTEGER NOT NULL, {columns}, '
+        f'PRIMARY KEY (user_id, entry_no)) WITHOUT ROWID'
+    )
+
+def _copy_entry(table: str) -> str:
+    """Move the flat v1 columns of table into entry 0 of its child table."""
+    columns = ENTRY_FIELDS[table]
+    flat = [f'{table}_{column}' for column in columns]
+    return (
+        f'INSERT INTO {table} (user_id, entry_no, {", ".join(columns)}) '
+        f'SELECT user_id, 0, {", ".join(flat)} FROM user_data_v1 '
+        f'WHERE COALESCE({", ".join(flat)}) IS NOT NULL'
+    )
+
+def normalize_cv(profile: dict, education: list, experience: list) -> Dict:
+    """Build the get_user_data document, with '' for missing values and without empty entries."""
+    document = {field: profile.get(field) or '' for field in PROFILE_FIELDS + SETTING_FIELDS}
+    for table, entries in (('education', education), ('experience', experience)):
+        document[table] = [
+            {column: entry.get(column) or '' for column in ENTRY_FIELDS[table]}
+            for entry in entries if any(entry.get(column) for column in ENTRY_FIELDS[table])
+        ]
+    return document
+
+# Empty CV document, the form fills entry 0 of both lists
+EMPTY_DOCUMENT = json.dumps({'education': [{}], 'experience': [{}]})
 
 class Database:
-    VALID_FIELDS = {
-        'full_name', 'email', 'phone', 'location', 'professional_summary',
-        'education_degree', 'education_institution', 'education_year', 'education_location',
-        'experience_company', 'experience_position', 'experience_period',
-        'experience_location', 'experience_description', 'skills', 'languages',
-        'additional_info'
+    VALID_FIELDS = set(FIELD_COLUMNS)
+
+    # Schema versions, applied in order and tracked in PRAGMA user_version
+    MIGRATIONS = [
+        # 1: the original flat table, one education and one experience per user
+        (
+            'CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, '
+            + ', '.join(f'{field} TEXT' for field in (
+                'full_name', 'email', 'phone', 'location', 'professional_summary',
+                'education_degree', 'education_institution', 'education_year', 'education_location',
+                'experience_company', 'experience_position', 'experience_period',
+                'experience_location', 'experience_description', 'skills', 'languages',
+                'additional_info'
+            )) + ')',
+        ),
+        # 2: entries in child tables clustered by (user_id, entry_no), completed flag,
+        # and the table of the "document" layout
+        (
+            'ALTER TABLE user_data RENAME TO user_data_v1',
+            'CREATE TABLE user_data (user_id INTEGER PRIMARY KEY, '
+            + ', '.join(f'{field} TEXT' for field in PROFILE_FIELDS)
+            + ', completed INTEGER NOT NULL DEFAULT 0)',
+            f'INSERT INTO user_data (user_id, {", ".join(PROFILE_FIELDS)}) '
+            f'SELECT user_id, {", ".join(PROFILE_FIELDS)} FROM user_data_v1',
+            _entry_table('education'),
+            _entry_table('experience'),
+            _copy_entry('education'),
+            _copy_entry('experience'),
+            'DROP TABLE user_data_v1',
+            'CREATE TABLE cv_documents (user_id INTEGER PRIMARY KEY, '
+            'completed INTEGER NOT NULL DEFAULT 0, doc TEXT NOT NULL)',
+        ),
+        # 3: Telegram file_ids of uploaded PDFs (storage/file_ids.py)
+        (
+            'CREATE TABLE file_ids (key TEXT PRIMARY KEY, file_id TEXT NOT NULL, '
+            'used_at REAL NOT NULL) WITHOUT ROWID',
+            'CREATE INDEX file_ids_used_at ON file_ids (used_at)',
+        ),
+        # 4: the template picked by the user
+        (
+            'ALTER TABLE user_data ADD COLUMN template TEXT',
+        ),
+        # 5: last change of the answers, for the retention period
+        (
+            'ALTER TABLE user_data ADD COLUMN updated_at REAL',
+            'ALTER TABLE cv_documents ADD COLUMN updated_at REAL',
+            # Existing answers get the full retention period from now on
+            "UPDATE user_data SET updated_at = CAST(strftime('%s', 'now') AS REAL)",
+            "UPDATE cv_documents SET updated_at = CAST(strftime('%s', 'now') AS REAL)",
+            'CREATE INDEX user_data_updated_at ON user_data (updated_at)',
+            'CREATE INDEX cv_documents_updated_at ON cv_documents (updated_at)',
+        ),
+    ]
+
+    # Statements per form field. The SQL text never changes, so sqlite3 reuses
+    # the prepared statement from its statement cache.
+    ENSURE_USER_SQL = 'INSERT INTO user_data (user_id) VALUES (?) ON CONFLICT(user_id) DO NOTHING'
+    UPSERT_SQL = {
+        field: (
+            f'INSERT INTO user_data (user_id, {column}) VALUES (?, ?) '
+            f'ON CONFLICT(user_id) DO UPDATE SET {column} = excluded.{column}'
+            if table is None else
+            f'INSERT INTO {table} (user_id, entry_no, {column}) VALUES (?, 0, ?) '
+            f'ON CONFLICT(user_id, entry_no) DO UPDATE SET {column} = excluded.{column}'
+        )
+        for field, (table, column) in FIELD_COLUMNS.items()
     }
+    # JSON path of every form field inside a CV document
+    DOCUMENT_PATHS = {
+        field: f'$.{column}' if table is None else f'$.{table}[0].{column}'
+        for field, (table, column) in FIELD_COLUMNS.items()
+    }
+
+    GET_SQL = (
+        f'SELECT {", ".join(PROFILE_FIELDS + SETTING_FIELDS)}, {_entry_select("education")}, {_entry_select("experience")} '
+        f'FROM user_data AS u WHERE user_id = ?'
+    )
 
-    def __init__(self, db_name: str = "user_data.db"):
+    def __init__(self, db_name: str = DB_PATH, layout: str = DB_LAYOUT):
         self.db_name = db_name
-        self._create_tables()
-
-    def _create_tables(self):
-        with sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_data (
-                    user_id INTEGER PRIMARY KEY,
-                    full_name TEXT,
-                    email TEXT,
-                    phone TEXT,
-                    location TEXT,
-                    professional_summary TEXT,
-                    education_degree TEXT,
-                    education_institution TEXT,
-                    education_year TEXT,
-                    education_location TEXT,
-                    experience_company TEXT,
-                    experience_position TEXT,
-                    experience_period TEXT,
-                    experience_location TEXT,
-                    experience_description TEXT,
-                    skills TEXT,
-                    languages TEXT,
-                    additional_info TEXT
-                )
-            ''')
-            conn.commit()
+        # "tables" keeps entries in child tables, "document" one JSON document per user
+        self.layout = layout
+        self._conn = None
+        self._connect_lock = None
+        self._write_lock = None
+        # Number of committed write transactions, for benchmarks
+        self.transactions = 0
+
+    @property
+    def _user_table(self) -> str:
+        """Table with one row per user, deleting it removes all of the user's answers."""
+        return 'cv_documents' if self.layout == 'document' else 'user_data'
+
+    async def _connection(self) -> aiosqlite.Connection:
+        """Open the shared connection on first use."""
+        if self._conn is not None:
+            return self._conn
+
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+            self._write_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._conn is None:
+                conn = await aiosqlite.connect(self.db_name, cached_statements=256)
+                # WAL lets readers run alongside the writer, NORMAL sync is safe with WAL
+                await conn.execute('PRAGMA journal_mode=WAL')
+                await conn.execute('PRAGMA synchronous=NORMAL')
+                await self.migrate(conn)
+                await conn.execute('PRAGMA foreign_keys=ON')
+                self._conn = conn
+        return self._conn
+
+    async def migrate(self, conn: aiosqlite.Connection, target: int = None):
+        """Bring the schema up to the target (default: latest) version."""
+        target = len(self.MIGRATIONS) if target is None else target
+        async with conn.execute('PRAGMA user_version') as cursor:
+            version = (await cursor.fetchone())[0]
+        for number in range(version + 1, target + 1):
+            await conn.execute('BEGIN IMMEDIATE')
+            try:
+                for statement in self.MIGRATIONS[number - 1]:
+                    await conn.execute(statement)
+                await conn.execute(f'PRAGMA user_version = {number}')
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+            logger.info("Migrated %s to schema version %d", self.db_name, number)
 
-    def update_user_data(self, user_id: int, field: str, value: str):
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    @_timed
+    async def update_user_data(self, user_id: int, field: str, value: str):
         # Validate field name
         if field not in self.VALID_FIELDS:
             raise ValueError(f"Invalid field name: {field}")
 
-        with sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            
-            # Check if user exists
-            cursor.execute('SELECT 1 FROM user_data WHERE user_id = ?', (user_id,))
-            if not cursor.fetchone():
-                # Create new user record with all fields as NULL
-                fields = ['user_id'] + list(self.VALID_FIELDS)
-                placeholders = ['?'] * (len(fields))
-                query = f'INSERT INTO user_data ({", ".join(fields)}) VALUES ({", ".join(placeholders)})'
-                values = [user_id] + [None] * len(self.VALID_FIELDS)
-                cursor.execute(query, values)
-            
-            # Update the specified field using parameterized query
-            cursor.execute('UPDATE user_data SET {} = ? WHERE user_id = ?'.format(field), (value, user_id))
-            conn.commit()
-
-    def get_user_data(self, user_id: int) -> Optional[Dict]:
-        with sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM user_data WHERE user_id = ?', (user_id,))
-            row = cursor.fetchone()
-            if row:
-                return {
-                    'full_name': row[1] or '',
-                    'email': row[2] or '',
-                    'phone': row[3] or '',
-                    'location': row[4] or '',
-                    'professional_summary': row[5] or '',
-                    'education': {
-                        'degree': row[6] or '',
-                        'institution': row[7] or '',
-                        'year': row[8] or '',
-                        'location': row[9] or ''
-                    },
-                    'experience': {
-                        'company': row[10] or '',
-                        'position': row[11] or '',
-                        'period': row[12] or '',
-                        'location': row[13] or '',
-                        'description': row[14] or ''
-                    },
-                    'skills': row[15] or '',
-                    'languages': row[16] or '',
-                    'additional_info': row[17] or ''
-                }
-            return None
-
-    def clear_user_data(self, user_id: int):
-        with sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM user_data WHERE user_id = ?', (user_id,))
-            conn.commit()
-
-    def mark_completed(self, user_id: int):
-        with sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute("UPDATE user_data SET is_completed = 1 WHERE user_id = ?", (user_id,))
-            conn.commit() 
\ No newline at end of file
+        conn = await self._connection()
+        async with self._write_lock:
+            if self.layout == 'document':
+                await conn.execute(
+                    'INSERT INTO cv_documents (user_id, doc) VALUES (?, json_set(?, ?, ?)) '
+                    'ON CONFLICT(user_id) DO UPDATE SET doc = json_set(doc, ?, ?)',
+                    (user_id, EMPTY_DOCUMENT, self.DOCUMENT_PATHS[field], value,
+                     self.DOCUMENT_PATHS[field], value)
+                )
+            else:
+                if FIELD_COLUMNS[field][0] is not None:
+                    await conn.execute(self.ENSURE_USER_SQL, (user_id,))
+                await conn.execute(self.UPSERT_SQL[field], (user_id, value))
+            await self._touch(conn, user_id)
+            await conn.commit()
+            self.transactions += 1
+
+    @_timed
+    async def save_user_data(self, user_id: int, fields: Dict[str, str]):
+        """Write several fields in a single transaction."""
+        invalid = set(fields) - self.VALID_FIELDS
+        if invalid:
+            raise ValueError(f"Invalid field names: {', '.join(sorted(invalid))}")
+        if not fields:
+            return
+
+        conn = await self._connection()
+        async with self._write_lock:
+            if self.layout == 'document':
+                names = sorted(fields)
+                # json_set takes any number of path/value pairs
+                pairs = ', '.join('?, ?' for _ in names)
+                params = [value for name in names for value in (self.DOCUMENT_PATHS[name], fields[name])]
+                await conn.execute(
+                    f'INSERT INTO cv_documents (user_id, doc) VALUES (?, json_set(?, {pairs})) '
+                    f'ON CONFLICT(user_id) DO UPDATE SET doc = json_set(doc, {pairs})',
+                    [user_id, EMPTY_DOCUMENT] + params + params
+                )
+            else:
+                # Group the fields per table, one UPSERT each
+                groups = {}
+                for name, value in fields.items():
+                    table, column = FIELD_COLUMNS[name]
+                    groups.setdefault(table, {})[column] = value
+                profile = groups.pop(None, {})
+                await self._upsert(conn, 'user_data', ('user_id',), [user_id], profile)
+                for table, values in sorted(groups.items()):
+                    await self._upsert(conn, table, ('user_id', 'entry_no'), [user_id, 0], values)
+            await self._touch(conn, user_id)
+            await conn.commit()
+            self.transactions += 1
+
+    async def _touch(self, conn: aiosqlite.Connection, user_id: int):
+        """Restart the retention period of the user's answers, inside the write transaction."""
+        await conn.execute(f'UPDATE {self._user_table} SET updated_at = ? WHERE user_id = ?', (time.time(), user_id))
+
+    @staticmethod
+    async def _upsert(conn: aiosqlite.Connection, table: str, key_columns, key_values, values: Dict[str, str]):
+        columns = sorted(values)
+        if not columns:
+            await conn.execute(
+                f'INSERT INTO {table} ({", ".join(key_columns)}) VALUES ({", ".join("?" * len(key_columns))}) '
+                f'ON CONFLICT({", ".join(key_columns)}) DO NOTHING',
+                key_values
+            )
+            return
+        all_columns = list(key_columns) + columns
+        await conn.execute(
+            f'INSERT INTO {table} ({", ".join(all_columns)}) VALUES ({", ".join("?" * len(all_columns))}) '
+            f'ON CONFLICT({", ".join(key_columns)}) DO UPDATE SET '
+            + ', '.join(f'{column} = excluded.{column}' for column in columns),
+            list(key_values) + [values[column] for column in columns]
+        )
+
+    @_timed
+    async def set_entries(self, user_id: int, table: str, entries: List[Dict[str, str]]):
+        """Replace all education or experience entries of a user."""
+        if table not in ENTRY_FIELDS:
+            raise ValueError(f"Invalid entry table: {table}")
+        entries = [{column: entry.get(column) for column in ENTRY_FIELDS[table]} for entry in entries]
+
+        conn = await self._connection()
+        async with self._write_lock:
+            if self.layout == 'document':
+                await conn.execute(
+                    'INSERT INTO cv_documents (user_id, doc) VALUES (?, json_set(?, ?, json(?))) '
+                    'ON CONFLICT(user_id) DO UPDATE SET doc = json_set(doc, ?, json(?))',
+                    (user_id, EMPTY_DOCUMENT, f'$.{table}', json.dumps(entries), f'$.{table}', json.dumps(entries))
+                )
+            else:
+                columns = ENTRY_FIELDS[table]
+                await conn.execute(self.ENSURE_USER_SQL, (user_id,))
+                await conn.execute(f'DELETE FROM {table} WHERE user_id = ?', (user_id,))
+                await conn.executemany(
+                    f'INSERT INTO {table} (user_id, entry_no, {", ".join(columns)}) '
+                    f'VALUES (?, ?{", ?" * len(columns)})',
+                    [[user_id, number] + [entry[column] for column in columns] for number, entry in enumerate(entries)]
+                )
+            await self._touch(conn, user_id)
+            await conn.commit()
+            self.transactions += 1
+
+    @_timed
+    async def get_user_data(self, user_id: int) -> Optional[Dict]:
+        """Return the user's CV with lists of education and experience entries, in one query."""
+        conn = await self._connection()
+        if self.layout == 'document':
+            async with conn.execute('SELECT doc FROM cv_documents WHERE user_id = ?', (user_id,)) as cursor:
+                row = await cursor.fetchone()
+            if row is None:
+                return None
+            document = json.loads(row[0])
+            return normalize_cv(document, document.get('education', []), document.get('experience', []))
+
+        async with conn.execute(self.GET_SQL, (user_id,)) as cursor:
+            row = await cursor.fetchone()
+            if row is None:
+                return None
+            names = [column[0] for column in cursor.description]
+        row = dict(zip(names, row))
+        return normalize_cv(row, json.loads(row['education']), json.loads(row['experience']))
+
+    @_timed
+    async def clear_user_data(self, user_id: int):
+        conn = await self._connection()
+        async with self._write_lock:
+            # Child entries go with the user_data row (ON DELETE CASCADE)
+            await conn.execute(f'DELETE FROM {self._user_table} WHERE user_id = ?', (user_id,))
+            await conn.commit()
+            self.transactions += 1
+
+    @_timed
+    async def mark_completed(self, user_id: int):
+        conn = await self._connection()
+        async with self._write_lock:
+            await conn.execute(f"UPDATE {self._user_table} SET completed = 1 WHERE user_id = ?", (user_id,))
+            await conn.commit()
+            self.transactions += 1
+
+
+    @_timed
+    async def delete_expired(self, max_age: float = USER_DATA_RETENTION) -> int:
+        """Delete the answers of users who haven't changed them for max_age seconds."""
+        conn = await self._connection()
+        async with self._write_lock:
+            cursor = await conn.execute(
+                f'DELETE FROM {self._user_table} WHERE updated_at < ?', (time.time() - max_age,)
+            )
+            await conn.commit()
+            self.transactions += 1
+        if cursor.rowcount:
+            USER_DATA_EXPIRED.inc(cursor.rowcount)
+            logger.info("Deleted the answers of %d users after the retention period", cursor.rowcount)
+        return cursor.rowcount
+
+    async def run_retention(self, max_age: float = USER_DATA_RETENTION,
+                            interval: float = USER_DATA_RETENTION_INTERVAL):
+        """Delete expired answers every `interval` seconds, until cancelled."""
+        if not max_age:
+            return
+        while True:
+            try:
+                await self.delete_expired(max_age)
+            except Exception:
+                logger.exception("Deleting expired user data failed")
+            await asyncio.sleep(interval)
+
+
+# Shared by all handlers, the connection is opened lazily on first use
+db = Database()
@@ -0,0 +1,132 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from ..config import REDIS_DSN, FILE_ID_CACHE, FILE_ID_CACHE_SIZE, FILE_ID_TTL
+
+# Redis key prefix of cached file_ids
+KEY_PREFIX = "cvforge:file_id:"
+
+
+def document_key(pdf_bytes: bytes, filename: str) -> str:
+    """Key of an uploaded document: its content hash and the name it was sent under."""
+    return f"{hashlib.sha256(pdf_bytes).hexdigest()}:{filename}"
+
+
+class MemoryFileIdCache:
+    """file_ids of uploaded documents kept in process, least recently used evicted first."""
+
+    def __init__(self, max_entries: int = FILE_ID_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        file_id = self._entries.get(key)
+        if file_id is not None:
+            self._entries.move_to_end(key)
+        return file_id
+
+    async def put(self, key: str, file_id: str):
+        self._entries[key] = file_id
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def close(self):
+        pass
+
+
+class SqliteFileIdCache:
+    """file_ids of uploaded documents in the bot's database, so they survive restarts.
+
+    Entries unused for `ttl` seconds, and the least recently used ones beyond
+    `max_entries`, are evicted whenever a new one is stored.
+    """
+
+    def __init__(self, database=None, ttl: int = FILE_ID_TTL, max_entries: int = FILE_ID_CACHE_SIZE):
+        if database is None:
+            from .db import db as database
+        self.db = database
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    async def get(self, key: str) -> Optional[str]:
+        conn = await self.db._connection()
+        async with conn.execute(
+            'SELECT file_id FROM file_ids WHERE key = ? AND used_at >= ?', (key, time.time() - self.ttl)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        async with self.db._write_lock:
+            await conn.execute('UPDATE file_ids SET used_at = ? WHERE key = ?', (time.time(), key))
+            await conn.commit()
+        return row[0]
+
+    async def put(self, key: str, file_id: str):
+        conn = await self.db._connection()
+        async with self.db._write_lock:
+            now = time.time()
+            await conn.execute(
+                'INSERT INTO file_ids (key, file_id, used_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET file_id = excluded.file_id, used_at = excluded.used_at',
+                (key, file_id, now)
+            )
+            await conn.execute('DELETE FROM file_ids WHERE used_at < ?', (now - self.ttl,))
+            await conn.execute(
+                'DELETE FROM file_ids WHERE used_at <= ('
+                'SELECT used_at FROM file_ids ORDER BY used_at DESC LIMIT 1 OFFSET ?)',
+                (self.max_entries,)
+            )
+            await conn.commit()
+
+    async def delete(self, key: str):
+        conn = await self.db._connection()
+        async with self.db._write_lock:
+            await conn.execute('DELETE FROM file_ids WHERE key = ?', (key,))
+            await conn.commit()
+
+    async def close(self):
+        # The connection belongs to the shared Database
+        pass
+
+
+class RedisFileIdCache:
+    """file_ids of uploaded documents shared by all replicas through Redis.
+
+    Every entry expires `ttl` seconds after its last use.
+    """
+
+    def __init__(self, dsn: str = REDIS_DSN, ttl: int = FILE_ID_TTL):
+        import redis.asyncio as redis
+        self.redis = redis.Redis.from_url(dsn)
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[str]:
+        # GETEX refreshes the TTL, so documents that are sent again stay cached
+        file_id = await self.redis.getex(KEY_PREFIX + key, ex=self.ttl)
+        return file_id.decode() if file_id is not None else None
+
+    async def put(self, key: str, file_id: str):
+        await self.redis.set(KEY_PREFIX + key, file_id, ex=self.ttl)
+
+    async def delete(self, key: str):
+        await self.redis.delete(KEY_PREFIX + key)
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+def create_file_id_cache():
+    """Return the cache selected by FILE_ID_CACHE, or None when it's off."""
+    if FILE_ID_CACHE == 'redis':
+        return RedisFileIdCache()
+    if FILE_ID_CACHE == 'sqlite':
+        return SqliteFileIdCache()
+    if FILE_ID_CACHE == 'memory':
+        return MemoryFileIdCache()
+    return None
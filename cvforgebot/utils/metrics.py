@@ -0,0 +1,196 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key: Tuple, extra: dict = None) -> str:
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in items) + '}'
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    type = 'counter'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(key)} {value}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._values.get(_label_key(labels))
+        return sum(series[:-1]) if series else 0
+
+    def samples(self):
+        for key, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(key, {'le': bound})} {cumulative}"
+            cumulative += series[len(self.buckets)]
+            yield f"{self.name}_bucket{_format_labels(key, {'le': '+Inf'})} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(key)} {series[-1]}"
+            yield f"{self.name}_count{_format_labels(key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# Bot handlers
+HANDLER_LATENCY = registry.histogram(
+    'cvforge_handler_latency_seconds', 'Handler latency by update type and FSM state')
+HANDLER_FAILURES = registry.counter(
+    'cvforge_handler_failures_total', 'Handlers that raised an exception')
+
+# LaTeX compilation
+COMPILE_STAGE = registry.histogram(
+    'cvforge_compile_stage_seconds', 'Time spent in each compile stage')
+COMPILE_QUEUE_WAIT = registry.histogram(
+    'cvforge_compile_queue_wait_seconds', 'Time a compile job waited for a free slot')
+COMPILE_PASSES = registry.counter(
+    'cvforge_compile_passes_total', 'TeX engine passes run')
+COMPILE_FAILURES = registry.counter(
+    'cvforge_compile_failures_total', 'Failed compile jobs by reason')
+TEMPLATE_RELOADS = registry.counter(
+    'cvforge_template_reloads_total', 'Template loads by result: loaded, reloaded or invalid')
+COMPILE_LIMIT_VIOLATIONS = registry.counter(
+    'cvforge_compile_limit_violations_total', 'Compile jobs stopped by an input or resource limit')
+COMPILE_REJECTED = registry.counter(
+    'cvforge_compile_rejected_total', 'Compile jobs rejected because the queue was full')
+COMPILE_JOBS_EXPIRED = registry.counter(
+    'cvforge_compile_jobs_expired_total', 'Queued compile jobs dropped because the bot stopped waiting for them')
+COMPILES_COALESCED = registry.counter(
+    'cvforge_compiles_coalesced_total', 'Generate requests turned away because the same user already had a job running')
+GENERATE_RATE_LIMITED = registry.counter(
+    'cvforge_generate_rate_limited_total', 'Generate requests rejected by a rate limit')
+GENERATE_DELAYED = registry.counter(
+    'cvforge_generate_delayed_total', 'Generate requests delayed by the global rate limit')
+PDF_OUTPUT_BYTES = registry.histogram(
+    'cvforge_pdf_output_bytes', 'Size of generated PDFs by output profile and stage',
+    buckets=(8192, 16384, 32768, 65536, 131072, 262144, 524288, 1048576, 4194304))
+PDF_POSTPROCESS_SAVED_BYTES = registry.counter(
+    'cvforge_pdf_postprocess_saved_bytes_total', 'Bytes removed from PDFs by the post-processor')
+COMPILES_SKIPPED = registry.counter(
+    'cvforge_compiles_skipped_total', "Jobs served from the user's previous build because the document was unchanged")
+PDF_CACHE_REQUESTS = registry.counter(
+    'cvforge_pdf_cache_requests_total', 'PDF cache lookups by result')
+OUTPUT_RECLAIMED_BYTES = registry.counter(
+    'cvforge_output_reclaimed_bytes_total', 'Bytes freed by the output sweeper by reason')
+OUTPUT_REMOVED_ENTRIES = registry.counter(
+    'cvforge_output_removed_entries_total', 'Files and directories removed by the output sweeper by reason')
+OUTPUT_SWEEP_DURATION = registry.histogram(
+    'cvforge_output_sweep_seconds', 'Duration of an output sweep')
+
+# Storage and delivery
+FSM_CACHE_REQUESTS = registry.counter(
+    'cvforge_fsm_cache_requests_total', 'FSM storage reads by cache result')
+DB_OPERATION = registry.histogram(
+    'cvforge_db_operation_seconds', 'Database operation latency')
+USER_DATA_EXPIRED = registry.counter(
+    'cvforge_user_data_expired_total', 'Users whose answers were deleted after the retention period')
+DOCUMENT_SEND = registry.histogram(
+    'cvforge_document_send_seconds', 'Time to send the PDF to Telegram')
+DOCUMENT_SEND_FAILURES = registry.counter(
+    'cvforge_document_send_failures_total', 'Failed PDF sends')
+DOCUMENT_UPLOAD_BYTES = registry.counter(
+    'cvforge_document_upload_bytes_total', 'PDF bytes uploaded to Telegram')
+FILE_ID_CACHE_REQUESTS = registry.counter(
+    'cvforge_file_id_cache_requests_total', 'file_id cache lookups by result')
+
+# Diagnostics
+PROFILE_SESSIONS = registry.counter(
+    'cvforge_profile_sessions_total', 'On-demand profiling sessions started')
+
+
+async def start_metrics_server(host: str, port: int):
+    """Serve /metrics over HTTP, returns the aiohttp runner so it can be cleaned up."""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,53 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from .metrics import HANDLER_LATENCY, HANDLER_FAILURES
+from .profiling import profiler
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Records handler latency per update type and FSM state."""
+
+    def __init__(self, update_type: str):
+        self.update_type = update_type
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        state = data.get('raw_state') or 'none'
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_FAILURES.inc(type=self.update_type, state=state)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - start, type=self.update_type, state=state)
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    """Adds handler time per update type and FSM state to a running profiling session."""
+
+    def __init__(self, update_type: str):
+        self.update_type = update_type
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not profiler.active:
+            return await handler(event, data)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            state = data.get('raw_state') or 'none'
+            profiler.record(f"handler {self.update_type} {state}", time.perf_counter() - start)
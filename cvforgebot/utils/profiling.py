@@ -0,0 +1,171 @@
+"""On-demand profiling of a running bot or worker.
+
+A session runs cProfile on the event loop thread and traces allocations with
+tracemalloc for a fixed window, and collects wall-clock time per handler and
+per compile stage from the hooks in the middleware and the compiler. At the
+end it writes a .prof file (readable with pstats or snakeviz) and a text
+summary of the hottest functions, stages and allocation sites to PROFILE_DIR.
+
+Sessions are started with the admin command `/debug profile 30s` or by
+sending SIGUSR1 to the process. While no session runs, the hooks only check
+`profiler.active`.
+"""
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import signal
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Optional
+
+from ..config import PROFILE_DIR, PROFILE_TOP_N, PROFILE_SIGNAL_SECONDS, PROFILE_TRACEMALLOC_FRAMES
+from .metrics import PROFILE_SESSIONS
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileReport:
+    def __init__(self, profile_path: str, summary_path: str, summary: str):
+        self.profile_path = profile_path
+        self.summary_path = summary_path
+        self.summary = summary
+
+
+class Profiler:
+    """One profiling session at a time for this process."""
+
+    def __init__(self, profile_dir: str = PROFILE_DIR, top_n: int = PROFILE_TOP_N):
+        self.profile_dir = profile_dir
+        self.top_n = top_n
+        # Checked by every hook, nothing else is done while it's False
+        self.active = False
+        self._profile = None
+        self._snapshot = None
+        self._started_tracemalloc = False
+        self._started_at = None
+        self._reason = ''
+        # stage -> [count, total seconds, max seconds]
+        self._stages = defaultdict(lambda: [0, 0.0, 0.0])
+        # Keeps the session started by a signal from being garbage collected
+        self._task = None
+
+    def record(self, stage: str, seconds: float):
+        """Add the duration of one run of a stage to the current session."""
+        if not self.active:
+            return
+        totals = self._stages[stage]
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = max(totals[2], seconds)
+
+    async def run(self, seconds: float, reason: str = '') -> ProfileReport:
+        """Profile for `seconds` and return the report.
+
+        Raises RuntimeError if a session is already running.
+        """
+        if self.active:
+            raise RuntimeError("A profiling session is already running")
+        self._start(reason)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            report = self._stop()
+        return report
+
+    def run_in_background(self, seconds: float, reason: str = ''):
+        """Start a session from a signal handler, the report is only logged."""
+        if self.active:
+            logger.warning("Profiling already running, %s ignored", reason)
+            return
+        self._task = asyncio.get_running_loop().create_task(self.run(seconds, reason))
+        self._task.add_done_callback(self._log_report)
+
+    @staticmethod
+    def _log_report(task: asyncio.Task):
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.error("Profiling failed: %s", task.exception())
+            return
+        report = task.result()
+        logger.info("Profile written to %s\n%s", report.profile_path, report.summary)
+
+    def _start(self, reason: str):
+        self._profile = cProfile.Profile()
+        # Raises ValueError if another profiler is already attached to this thread
+        self._profile.enable()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        self._snapshot = tracemalloc.take_snapshot()
+        self._stages.clear()
+        self._started_at = time.time()
+        self._reason = reason
+        self.active = True
+        PROFILE_SESSIONS.inc()
+        logger.info("Profiling started (%s)", reason or 'no reason given')
+
+    def _stop(self) -> ProfileReport:
+        self.active = False
+        self._profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stem = os.path.join(
+            self.profile_dir,
+            f"profile-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self._started_at))}"
+        )
+        self._profile.dump_stats(f"{stem}.prof")
+        summary = self._summary(snapshot)
+        with open(f"{stem}.txt", 'w', encoding='utf-8') as f:
+            f.write(summary)
+
+        self._profile = None
+        self._snapshot = None
+        return ProfileReport(f"{stem}.prof", f"{stem}.txt", summary)
+
+    def _summary(self, snapshot) -> str:
+        duration = time.time() - self._started_at
+        lines = [f"Profile of pid {os.getpid()}, {duration:.1f}s ({self._reason or 'no reason given'})", ""]
+
+        lines.append(f"Top {self.top_n} functions by own time:")
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=stream)
+        stats.strip_dirs().sort_stats(pstats.SortKey.TIME).print_stats(self.top_n)
+        # Skip the pstats banner up to the column header
+        output = stream.getvalue().splitlines()
+        header = next((i for i, line in enumerate(output) if 'ncalls' in line), 0)
+        lines.extend(line for line in output[header:] if line.strip())
+
+        lines.append("")
+        lines.append("Stages:")
+        lines.append(f"  {'stage':<40}{'count':>7}{'total':>11}{'mean':>11}{'max':>11}")
+        for stage, (count, total, longest) in sorted(self._stages.items(), key=lambda item: -item[1][1]):
+            lines.append(
+                f"  {stage:<40}{count:>7}{total * 1000:>9.1f}ms{total / count * 1000:>9.1f}ms{longest * 1000:>9.1f}ms"
+            )
+
+        lines.append("")
+        lines.append(f"Top {self.top_n} allocation sites since the start:")
+        for stat in snapshot.compare_to(self._snapshot, 'lineno')[:self.top_n]:
+            lines.append(f"  {stat}")
+        return '\n'.join(lines) + '\n'
+
+
+# Shared by the hooks of this process
+profiler = Profiler()
+
+
+def install_signal_handler(seconds: float = PROFILE_SIGNAL_SECONDS, loop: Optional[asyncio.AbstractEventLoop] = None):
+    """Profile for `seconds` whenever the process receives SIGUSR1."""
+    if not hasattr(signal, 'SIGUSR1'):
+        return
+    loop = loop or asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGUSR1, profiler.run_in_background, seconds, 'SIGUSR1')
@@ -0,0 +1,55 @@
+"""Standalone compile worker.
+
+Consumes LaTeX compile jobs queued by bots running with COMPILE_BACKEND=redis.
+Start as many workers as needed on any machine that can reach Redis:
+
+    python -m cvforgebot.worker --concurrency 4
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from cvforgebot.config import REDIS_DSN, COMPILE_CONCURRENCY, METRICS_HOST, METRICS_PORT
+from cvforgebot.latex.compiler import get_compiler
+from cvforgebot.latex.queue import CompileWorker
+from cvforgebot.utils.metrics import start_metrics_server
+from cvforgebot.utils.profiling import install_signal_handler
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(name)s %(message)s"
+)
+
+async def main():
+    parser = argparse.ArgumentParser(description="CV Forge compile worker")
+    parser.add_argument('--redis', default=REDIS_DSN, help="Redis URL of the job queue")
+    parser.add_argument('--concurrency', type=int, default=COMPILE_CONCURRENCY,
+                        help="jobs compiled at the same time (default: CPU count)")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT)
+    args = parser.parse_args()
+
+    compiler = get_compiler()
+    await compiler.warm_up()
+    worker = CompileWorker(compiler, dsn=args.redis, concurrency=args.concurrency)
+    sweeper_task = asyncio.create_task(compiler.create_sweeper().run())
+
+    # Stop gracefully, unfinished jobs go back to the queue
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    # `kill -USR1 <pid>` profiles the worker
+    install_signal_handler(loop=loop)
+
+    metrics_runner = None
+    if args.metrics_port:
+        metrics_runner = await start_metrics_server(METRICS_HOST, args.metrics_port)
+    try:
+        await worker.run()
+    finally:
+        sweeper_task.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+
+if __name__ == '__main__':
+    asyncio.run(main())
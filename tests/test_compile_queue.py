@@ -0,0 +1,148 @@
+"""Redis compile queue against a local Redis server.
+
+Uses database 15 of redis://localhost:6379 (REDIS_TEST_URL to change it) and
+flushes it, the tests are skipped if no server answers.
+"""
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+redis = pytest.importorskip('redis')
+
+from cvforgebot.latex.queue import (  # noqa: E402
+    CompileWorker, RedisCompileQueue, QUEUE_KEY, PROCESSING_PREFIX, HEARTBEAT_PREFIX, DONE_PREFIX
+)
+
+REDIS_TEST_URL = os.getenv('REDIS_TEST_URL', 'redis://localhost:6379/15')
+
+
+@pytest.fixture(autouse=True)
+def clean_redis():
+    client = redis.Redis.from_url(REDIS_TEST_URL)
+    try:
+        client.ping()
+    except redis.ConnectionError:
+        pytest.skip(f"No Redis server at {REDIS_TEST_URL}")
+    client.flushdb()
+    yield client
+    client.flushdb()
+    client.close()
+
+
+class FakeCompiler:
+    """Returns the user id as the PDF, failing the first `failures` builds."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = 0
+
+    async def build_pdf(self, data: dict, user_id) -> bytes:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("LaTeX failed")
+        return f"pdf-{user_id}".encode()
+
+
+async def with_worker(compiler, work, retries: int = 2):
+    """Run `work(worker)` while a worker consumes the queue."""
+    worker = CompileWorker(compiler, dsn=REDIS_TEST_URL, retries=retries)
+    task = asyncio.create_task(worker.run())
+    try:
+        return await work(worker)
+    finally:
+        worker.stop()
+        await task
+
+
+async def submit(data: dict, user_id: int) -> bytes:
+    queue = RedisCompileQueue(dsn=REDIS_TEST_URL)
+    try:
+        return await asyncio.wait_for(queue.submit(data, user_id), timeout=10)
+    finally:
+        await queue.close()
+
+
+def test_submit_and_complete(clean_redis):
+    compiler = FakeCompiler()
+
+    async def work(worker):
+        assert await submit({'name': 'Ada'}, 1) == b'pdf-1'
+        return worker.processing_key
+
+    processing_key = asyncio.run(with_worker(compiler, work))
+    assert compiler.calls == 1
+    assert clean_redis.llen(processing_key) == 0
+    assert clean_redis.llen(QUEUE_KEY) == 0
+
+
+def test_failed_build_is_retried(clean_redis):
+    compiler = FakeCompiler(failures=1)
+
+    async def work(worker):
+        assert await submit({}, 2) == b'pdf-2'
+        return worker.processing_key
+
+    processing_key = asyncio.run(with_worker(compiler, work))
+    assert compiler.calls == 2
+    assert clean_redis.llen(processing_key) == 0
+    assert clean_redis.llen(QUEUE_KEY) == 0
+
+
+def test_retries_exhausted(clean_redis):
+    compiler = FakeCompiler(failures=10)
+
+    async def work(worker):
+        with pytest.raises(Exception, match="LaTeX failed"):
+            await submit({}, 3)
+        return worker.processing_key
+
+    processing_key = asyncio.run(with_worker(compiler, work, retries=1))
+    assert compiler.calls == 2
+    assert clean_redis.llen(processing_key) == 0
+
+
+def test_expired_job_is_dropped(clean_redis):
+    compiler = FakeCompiler()
+    job = {'id': 'expired', 'user_id': 4, 'data': {}, 'attempts': 0,
+           'enqueued_at': time.time() - 60, 'deadline': time.time() - 1}
+    clean_redis.lpush(QUEUE_KEY, json.dumps(job))
+
+    async def work(worker):
+        for _ in range(100):
+            if not await worker.redis.llen(QUEUE_KEY) and not await worker.redis.llen(worker.processing_key):
+                break
+            await asyncio.sleep(0.05)
+        return worker.processing_key
+
+    processing_key = asyncio.run(with_worker(compiler, work))
+    assert compiler.calls == 0
+    assert clean_redis.llen(QUEUE_KEY) == 0
+    assert clean_redis.llen(processing_key) == 0
+    assert not clean_redis.exists(DONE_PREFIX + 'expired')
+
+
+def test_dead_worker_jobs_are_recovered(clean_redis):
+    clean_redis.rpush(PROCESSING_PREFIX + 'dead', b'job-of-dead-worker')
+    clean_redis.rpush(PROCESSING_PREFIX + 'alive', b'job-of-live-worker')
+    clean_redis.set(HEARTBEAT_PREFIX + 'alive', 1)
+
+    async def recover():
+        worker = CompileWorker(FakeCompiler(), dsn=REDIS_TEST_URL)
+        try:
+            await worker.recover_orphaned_jobs()
+        finally:
+            await worker.redis.aclose()
+
+    asyncio.run(recover())
+    assert clean_redis.lrange(QUEUE_KEY, 0, -1) == [b'job-of-dead-worker']
+    assert clean_redis.llen(PROCESSING_PREFIX + 'dead') == 0
+    assert clean_redis.lrange(PROCESSING_PREFIX + 'alive', 0, -1) == [b'job-of-live-worker']
+
+
+def test_worker_ids_are_unique():
+    first = CompileWorker(FakeCompiler(), dsn=REDIS_TEST_URL)
+    second = CompileWorker(FakeCompiler(), dsn=REDIS_TEST_URL)
+    assert first.worker_id != second.worker_id
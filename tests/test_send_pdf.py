@@ -0,0 +1,101 @@
+"""send_pdf against the fake Bot API server of the benchmarks."""
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('aiogram')
+
+from aiogram import Bot, types  # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession  # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer  # noqa: E402
+
+from benchmarks.fake_telegram import FakeTelegramServer  # noqa: E402
+from cvforgebot.handlers import generate  # noqa: E402
+from cvforgebot.storage.file_ids import MemoryFileIdCache  # noqa: E402
+
+CHAT_ID = 1
+PDF = b'%PDF-1.5 first resume'
+OTHER_PDF = b'%PDF-1.5 second resume'
+
+
+def run_with_bot(check, max_entries: int = 16):
+    """Run `check(server, message)` with send_pdf talking to a fake Bot API server."""
+    async def main():
+        server = FakeTelegramServer()
+        await server.start()
+        bot = Bot(token='42:TEST', session=AiohttpSession(api=TelegramAPIServer.from_base(server.base_url)))
+        message = types.Message(
+            message_id=1, date=int(time.time()), chat=types.Chat(id=CHAT_ID, type='private')
+        ).as_(bot)
+        try:
+            await check(server, message)
+        finally:
+            await bot.session.close()
+            await server.stop()
+
+    saved = generate.file_ids
+    generate.file_ids = MemoryFileIdCache(max_entries=max_entries)
+    try:
+        asyncio.run(main())
+    finally:
+        generate.file_ids = saved
+
+
+def test_miss_uploads_and_hit_reuses_file_id():
+    async def check(server, message):
+        first = await generate.send_pdf(message, PDF, 'resume.pdf')
+        assert server.uploaded_bytes == len(PDF)
+        assert server.file_id_sends == 0
+
+        second = await generate.send_pdf(message, PDF, 'resume.pdf')
+        assert server.uploaded_bytes == len(PDF)
+        assert server.file_id_sends == 1
+        assert second.document.file_id == first.document.file_id
+
+    run_with_bot(check)
+
+
+def test_same_bytes_under_another_name_are_uploaded():
+    async def check(server, message):
+        await generate.send_pdf(message, PDF, 'resume.pdf')
+        await generate.send_pdf(message, PDF, 'cv.pdf')
+        assert server.uploaded_bytes == 2 * len(PDF)
+        assert server.file_id_sends == 0
+
+    run_with_bot(check)
+
+
+def test_stale_file_id_falls_back_to_upload():
+    async def check(server, message):
+        first = await generate.send_pdf(message, PDF, 'resume.pdf')
+        server.forget_file_ids()
+
+        second = await generate.send_pdf(message, PDF, 'resume.pdf')
+        # The rejected file_id call, then the upload
+        assert server.calls['sendDocument'] == 3
+        assert server.uploaded_bytes == 2 * len(PDF)
+        assert second.document.file_id != first.document.file_id
+
+        # The new file_id replaced the stale one
+        third = await generate.send_pdf(message, PDF, 'resume.pdf')
+        assert server.file_id_sends == 1
+        assert third.document.file_id == second.document.file_id
+
+    run_with_bot(check)
+
+
+def test_evicted_entry_is_uploaded_again():
+    async def check(server, message):
+        await generate.send_pdf(message, PDF, 'resume.pdf')
+        # Evicts the first document, the cache holds one entry
+        await generate.send_pdf(message, OTHER_PDF, 'resume.pdf')
+
+        await generate.send_pdf(message, PDF, 'resume.pdf')
+        assert server.file_id_sends == 0
+        assert server.uploaded_bytes == 2 * len(PDF) + len(OTHER_PDF)
+
+        await generate.send_pdf(message, PDF, 'resume.pdf')
+        assert server.file_id_sends == 1
+
+    run_with_bot(check, max_entries=1)